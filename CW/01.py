@@ -1,14 +1,22 @@
+import os
+import sys
 import requests
 import numpy as np
 from qdrant_client import QdrantClient
-from qdrant_client.http.models import Distance, VectorParams, PointStruct
+from qdrant_client.http.models import PointStruct
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from common.embed_cache import get_default_cache
+from common.numpy_index import NumpyIndex
+from common.collection_schema import apply as apply_schema
+from common.schemas import metric_comparison
 
 # --- 參數設定 ---
 QDRANT_URL = "http://localhost:6333"
 EMBED_API_URL = "https://ws-04.wade0426.me/embed"
 
 # --- 函式 0：從 API 取得向量並動態計算維度 ---
-def get_embeddings_and_dimension(texts):
+def fetch_embeddings(texts):
     data = {
         "texts": texts,
         "normalize": True,
@@ -17,31 +25,31 @@ def get_embeddings_and_dimension(texts):
     response = requests.post(EMBED_API_URL, json=data)
     
     if response.status_code == 200:
-        result = response.json()
-        embeddings = result['embeddings']
-        detected_dim = len(embeddings[0])
         print(f"✅ API 狀態碼: {response.status_code}")
-        print(f"✅ 動態偵測維度: {detected_dim}")
-        return embeddings, detected_dim
+        return response.json()['embeddings']
     else:
         raise Exception(f"❌ API 請求失敗")
 
+def get_embeddings_and_dimension(texts):
+    # 先查本地快取，只有新文本才會呼叫 API
+    cache = get_default_cache()
+    embeddings = cache.get_or_fetch(texts, fetch_embeddings, model=EMBED_API_URL, normalize=True)
+    detected_dim = len(embeddings[0])
+    print(f"✅ 動態偵測維度: {detected_dim} (快取命中 {cache.hits} / 未命中 {cache.misses})")
+    return embeddings, detected_dim
+
 # --- 函式 1：初始化環境 ---
 def init_qdrant_environment(client, dimension):
     collections_config = {
-        "euclidean_collection": Distance.EUCLID,
-        "inner_product_collection": Distance.DOT,
-        "cosine_collection": Distance.COSINE
+        "euclidean_collection": "euclid",
+        "inner_product_collection": "dot",
+        "cosine_collection": "cosine"
     }
     print(f"--- 正在初始化 Qdrant 環境 (維度: {dimension}) ---")
+    # 設定未變動時沿用既有的庫 (固定 id 的 upsert 會直接覆蓋)，只有維度或度量改變才重建
     for name, dist in collections_config.items():
-        if client.collection_exists(name):
-            client.delete_collection(name)
-        client.create_collection(
-            collection_name=name,
-            vectors_config=VectorParams(size=dimension, distance=dist),
-        )
-        print(f"✅ 庫 [{name}] 建立成功")
+        apply_schema(client, metric_comparison(name, dimension, dist))
+        print(f"✅ 庫 [{name}] 就緒")
     return collections_config
 
 # --- 函式 2：資料插入 ---
@@ -77,9 +85,32 @@ def search_and_rank_all(client, collections, query_vector, query_text):
             text = hit.payload.get("text", "未知")
             print(f"No.{i:<4} | {hit.id:<4} | {hit.score:<12.4f} | {text}")
 
+# --- 本地模式：不需要 Qdrant 伺服器，三種度量共用同一份向量矩陣 ---
+LOCAL_METRICS = {
+    "euclidean_collection": "euclid",
+    "inner_product_collection": "dot",
+    "cosine_collection": "cosine"
+}
+
+def search_and_rank_all_local(embeddings, texts, query_vector, query_text):
+    index = NumpyIndex(len(embeddings[0]), capacity=len(embeddings))
+    index.add(embeddings, payloads=[{"text": t} for t in texts])
+    print("\n" + "="*70)
+    print(f"📥 【查詢基準】: {query_text} (本地索引)")
+    print("="*70)
+
+    # 向量已正規化時三種度量只需排序一次
+    hits_by_metric = index.search_batch_metrics([query_vector], list(LOCAL_METRICS.values()), limit=5)
+    for name, metric in LOCAL_METRICS.items():
+        print(f"\n🔍 度量: {name}")
+        print(f"{'排名':<6} | {'ID':<4} | {'相似度得分':<12} | {'對應文本'}")
+        print("-" * 65)
+        for i, hit in enumerate(hits_by_metric[metric][0], 1):
+            print(f"No.{i:<4} | {hit.id:<4} | {hit.score:<12.4f} | {hit.payload['text']}")
+
 # --- 主程式執行區塊 ---
 if __name__ == "__main__":
-    client = QdrantClient(url=QDRANT_URL)
+    client = None if "--local" in sys.argv else QdrantClient(url=QDRANT_URL)
     
     # 你的五個評分對象
     my_texts = [
@@ -93,15 +124,18 @@ if __name__ == "__main__":
     try:
         # 1. 取得向量與維度
         embeddings, current_dim = get_embeddings_and_dimension(my_texts)
-        
-        # 2. 初始化
-        colls = init_qdrant_environment(client, current_dim)
-        
-        # 3. 插入資料 (帶上文本標籤方便閱讀排名)
-        insert_data(client, colls, embeddings, my_texts)
-        
-        # 4. 比較 5 筆資料的排名 (以第 0 筆為查詢基準)
-        search_and_rank_all(client, colls, embeddings[0], my_texts[0])
+
+        if client is None:
+            search_and_rank_all_local(embeddings, my_texts, embeddings[0], my_texts[0])
+        else:
+            # 2. 初始化
+            colls = init_qdrant_environment(client, current_dim)
+
+            # 3. 插入資料 (帶上文本標籤方便閱讀排名)
+            insert_data(client, colls, embeddings, my_texts)
+
+            # 4. 比較 5 筆資料的排名 (以第 0 筆為查詢基準)
+            search_and_rank_all(client, colls, embeddings[0], my_texts[0])
         
         print(f"\n🚀 5 筆資料的比較與排名已完成！")
         
@@ -1,13 +1,17 @@
+import os
+import sys
 from qdrant_client import QdrantClient
-from sentence_transformers import SentenceTransformer
 
-# 1. 初始化
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from common.embed_backends import make_backend
+
+# 1. 初始化 (EMBED_BACKEND=torch / onnx-int8，模型在第一次查詢時才載入)
 client = QdrantClient(url="http://localhost:6333")
-model = SentenceTransformer('all-MiniLM-L6-v2')
+model = make_backend(model_name='all-MiniLM-L6-v2')
 collections = ["rag_cosine", "rag_euclidean", "rag_dot"]
 
 def run_comprehensive_comparison(query):
-    query_vector = model.encode(query).tolist()
+    query_vector = model.embed_one(query)
     print(f"\n" + "🚀" * 30)
     print(f"🔍 測試問題：【{query}】")
     print("🚀" * 30)
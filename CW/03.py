@@ -1,11 +1,22 @@
 import os
 import glob
 import pandas as pd
-import uuid
 import time
+import sys
 import requests
 from qdrant_client import QdrantClient, models
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from common.embed_cache import get_default_cache
+from common.ingest_manifest import IngestManifest
+from common.point_ids import chunk_point_id
+from common.bulk_upsert import batched, stream_upsert
+from common.inverted_index import InvertedIndex, rrf_fuse
+from common.chunk_store import ChunkStore
+from common.quantization import search_params
+from common.collection_schema import apply as apply_schema
+from common.schemas import gemma_multi_turn_rag
+
 # --- 1. 基本設定 (請確保路徑正確) ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 os.chdir(BASE_DIR)
@@ -17,16 +28,30 @@ API_KEY = "YOUR_API_KEY" # ⚠️ 請填入您的 API Key
 
 client = QdrantClient(url="http://localhost:6333")
 COLLECTION_NAME = "gemma_multi_turn_rag"
+CHUNK_STRATEGY = "fixed_400_step_350"
+RETRIEVE_CANDIDATES = 10  # dense 與關鍵字各取的候選數，RRF 融合後取前 3
+# full：chunk 文字同時存在 Qdrant payload；ids：Qdrant 只存 id，文字一律從本地 chunk store 取
+PAYLOAD_MODE = os.environ.get("QDRANT_PAYLOAD", "full")
+
+# 關鍵字倒排索引與 chunk 文字庫 (與 collection 同步增量更新，存在 .cache/stores/ 下)
+lexical_index = InvertedIndex.open(COLLECTION_NAME)
+chunk_store = ChunkStore.open(COLLECTION_NAME)
 
 # --- 2. 工具函數 ---
 
+def fetch_embedding(texts: list):
+    """呼叫 Embedding API"""
+    res = requests.post(EMBED_API_URL, json={
+        "texts": texts, "normalize": True, "task_description": "檢索技術文件"
+    }, timeout=60)
+    return res.json()["embeddings"]
+
 def get_embedding(texts: list):
-    """取得向量"""
+    """取得向量 (先查本地快取，只把沒算過的文本送到 API)"""
     try:
-        res = requests.post(EMBED_API_URL, json={
-            "texts": texts, "normalize": True, "task_description": "檢索技術文件"
-        }, timeout=60)
-        return res.json()["embeddings"]
+        return get_default_cache().get_or_fetch(
+            texts, fetch_embedding, model=EMBED_API_URL, task_description="檢索技術文件", normalize=True
+        )
     except Exception as e:
         print(f"❌ Embedding 錯誤: {e}")
         return None
@@ -47,7 +72,7 @@ def call_llm(prompt: str):
 
 # --- 3. 知識庫初始化 (Step 1/2) ---
 
-def initialize_db():
+def initialize_db(rebuild=False):
     print(f"📡 正在初始化 Qdrant: {COLLECTION_NAME}...")
     
     # 偵測檔案 (支援有無 (1) 的情況)
@@ -61,31 +86,98 @@ def initialize_db():
     sample_vec = get_embedding(["test"])[0]
     dim = len(sample_vec)
 
-    if client.collection_exists(COLLECTION_NAME):
-        client.delete_collection(COLLECTION_NAME)
-    
-    client.create_collection(
-        collection_name=COLLECTION_NAME,
-        vectors_config=models.VectorParams(size=dim, distance=models.Distance.COSINE)
-    )
-
-    all_points = []
+    # 增量匯入：manifest 記錄每個檔案與 chunk 的雜湊，只處理有變動的部分
+    # (量化 / HNSW 等索引設定由 schema 就地調整，不需要重新匯入，因此不放進 manifest)
+    manifest = IngestManifest(COLLECTION_NAME, config={
+        "embed_url": EMBED_API_URL, "dim": dim, "chunking": CHUNK_STRATEGY, "point_ids": "uuid5-content",
+        "payload": PAYLOAD_MODE
+    })
+    # 倒排索引或 chunk store 遺失時也全量重建，確保各處內容一致
+    full_rebuild = rebuild or manifest.reset or not len(lexical_index) or not len(chunk_store)
+    if apply_schema(client, gemma_multi_turn_rag(dim), recreate=full_rebuild) in ("created", "recreated"):
+        print("🧱 全量匯入")
+        manifest.clear()
+        lexical_index.clear()
+        chunk_store.clear()
+
+    # point id 由 (切塊策略, 內容雜湊) 決定：重跑 upsert 冪等，相同內容只存一點
+    make_id = lambda text, _: chunk_point_id(text, strategy=CHUNK_STRATEGY)
+    new_texts, stale_ids = {}, []
     for path in file_paths:
         file_name = os.path.basename(path)
+        fingerprint = manifest.check(file_name, path)
+        if fingerprint is None:
+            print(f"⏭️ 未變動: {file_name}")
+            continue
         print(f"📖 讀取檔案: {file_name}")
         with open(path, 'r', encoding='utf-8') as f:
             content = f.read()
-            # 簡單切分 (每 400 字一段)
-            chunks = [content[i:i+400] for i in range(0, len(content), 350)]
-            vectors = get_embedding(chunks)
-            for chunk, vec in zip(chunks, vectors):
-                all_points.append(models.PointStruct(
-                    id=str(uuid.uuid4()), vector=vec,
-                    payload={"text": chunk, "source": file_name}
-                ))
-    
-    client.upsert(collection_name=COLLECTION_NAME, points=all_points)
-    print(f"✅ 知識庫匯入完成，共 {len(all_points)} 筆。")
+        # 簡單切分 (每 400 字一段)
+        chunks = [content[i:i+400] for i in range(0, len(content), 350)]
+        new_items, stale = manifest.sync_file(file_name, fingerprint, chunks, make_id=make_id)
+        stale_ids.extend(stale)
+        new_texts.update((point_id, chunk) for point_id, _, chunk in new_items)
+    stale_ids.extend(manifest.drop_missing({os.path.basename(p) for p in file_paths}))
+
+    # 以 manifest 為準算出每個點目前的所有來源
+    id_sources = manifest.id_sources()
+    def iter_points():
+        """每 256 筆向量化一次並串流交給上傳器，不必把所有 PointStruct 留在記憶體"""
+        for ids in batched(new_texts, 256):
+            vectors = get_embedding([new_texts[i] for i in ids])
+            for point_id, vec in zip(ids, vectors):
+                sources = id_sources[point_id]
+                chunk_store.put(point_id, new_texts[point_id], source=sources[0], sources=sources)
+                payload = {"text": new_texts[point_id], "source": sources[0], "sources": sources}
+                yield point_id, vec, payload if PAYLOAD_MODE == "full" else {}
+
+    upserted = 0
+    if new_texts:
+        upserted = stream_upsert(client, COLLECTION_NAME, iter_points())["points"]
+
+    # 仍被其他檔案引用的點只更新來源，沒有任何來源的點才刪除
+    stale_ids = list(dict.fromkeys(i for i in stale_ids if i not in new_texts))
+    orphan_ids = [i for i in stale_ids if i not in id_sources]
+    for point_id in stale_ids:
+        if point_id in id_sources:
+            sources = id_sources[point_id]
+            chunk_store.update_meta(point_id, source=sources[0], sources=sources)
+            if PAYLOAD_MODE == "full":
+                client.set_payload(collection_name=COLLECTION_NAME, payload={"source": sources[0], "sources": sources},
+                                   points=[point_id])
+    if orphan_ids:
+        client.delete(collection_name=COLLECTION_NAME, points_selector=models.PointIdsList(points=orphan_ids))
+
+    for point_id in orphan_ids:
+        lexical_index.remove(point_id)
+        chunk_store.delete(point_id)
+    for point_id, text in new_texts.items():
+        lexical_index.add(point_id, text)
+    lexical_index.save()
+    chunk_store.flush()
+    chunk_store.compact()
+    manifest.save()
+    print(f"✅ 知識庫匯入完成：新增/更新 {upserted} 筆，刪除 {len(orphan_ids)} 筆。")
+
+def hybrid_retrieve(query: str, limit: int = 3):
+    """
+    dense 檢索與本地關鍵字檢索各取候選，以 RRF 融合；回傳前 limit 筆的 {"text", "source", ...}。
+    ids 模式下 Qdrant 只回傳 id，文字與來源由 chunk store 取得
+    """
+    # 多輪對話的問題依序改寫、逐題檢索，直接呼叫 (沒有併發查詢可合併，不經微批次閘道)
+    vectors = get_embedding([query])
+    if not vectors or vectors[0] is None:
+        return []
+    q_vec = vectors[0]
+    dense_hits = client.query_points(
+        collection_name=COLLECTION_NAME, query=q_vec, limit=RETRIEVE_CANDIDATES, search_params=search_params(),
+        with_payload=PAYLOAD_MODE == "full"
+    ).points
+    lexical_hits = lexical_index.search(query, RETRIEVE_CANDIDATES)
+    fused = rrf_fuse([[p.id for p in dense_hits], [i for i, _ in lexical_hits]], limit=limit)
+
+    payloads = {p.id: p.payload for p in dense_hits if p.payload}
+    return [payloads.get(i) or chunk_store.record(i) for i, _ in fused if i in payloads or i in chunk_store]
 
 # --- 4. 執行任務 (Step 2/2) ---
 
@@ -123,14 +215,11 @@ def run_task():
         rewritten_q = call_llm(rewrite_prompt)
         print(f"   🔍 改寫後: {rewritten_q}")
 
-        # 關鍵步驟 2：檢索 (使用改寫後的問題)
-        q_vec = get_embedding([rewritten_q])[0]
-        search_res = client.query_points(
-            collection_name=COLLECTION_NAME, query=q_vec, limit=3
-        ).points
+        # 關鍵步驟 2：檢索 (使用改寫後的問題，dense + 關鍵字融合)
+        search_res = hybrid_retrieve(rewritten_q)
         
-        context = "\n".join([p.payload['text'] for p in search_res])
-        source = search_res[0].payload['source'] if search_res else "未知"
+        context = "\n".join([p['text'] for p in search_res])
+        source = search_res[0]['source'] if search_res else "未知"
 
         # 關鍵步驟 3：根據檢索結果回答
         final_prompt = (
@@ -154,5 +243,5 @@ def run_task():
     print("\n🎉 任務完成！結果儲存至: Re_Write_questions_final.csv")
 
 if __name__ == "__main__":
-    initialize_db()
+    initialize_db(rebuild="--rebuild" in sys.argv)
     run_task()
\ No newline at end of file
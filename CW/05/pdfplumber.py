@@ -1,3 +1,4 @@
+# 大型 PDF 的平行逐頁擷取請改用 (在專案根目錄)：python -m common.pdfplumber_parallel example.pdf -o output_pdfplumber.md
 import pdfplumber
 import os
 
@@ -1,3 +1,5 @@
+import os
+import sys
 import logging
 from pathlib import Path
 from docling.datamodel.base_models import InputFormat
@@ -6,6 +8,12 @@ from docling.datamodel.pipeline_options import VlmPipelineOptions
 from docling.datamodel.pipeline_options_vlm_model import ApiVlmOptions, ResponseFormat
 from docling.pipeline.vlm_pipeline import VlmPipeline
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from common.conversion_cache import ConversionCache, convert_pdf_cached
+from common.converters import docling_pages
+from common.vlm_pages import convert_pages
+from common.batch_convert import convert_batch, expand_inputs
+
 # 設定日誌
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -34,6 +42,30 @@ def get_vlm_options() -> ApiVlmOptions:
         response_format=ResponseFormat.MARKDOWN,
     )
 
+def build_converter(vlm_options: ApiVlmOptions) -> DocumentConverter:
+    """建立轉換器，指定 PDF 使用 VlmPipeline"""
+    pipeline_options = VlmPipelineOptions(
+        vlm_options=vlm_options,
+        enable_remote_services=True 
+    )
+    return DocumentConverter(
+        format_options={
+            InputFormat.PDF: PdfFormatOption(
+                pipeline_options=pipeline_options,
+                pipeline_cls=VlmPipeline
+            )
+        }
+    )
+
+def cache_options(vlm_options: ApiVlmOptions) -> dict:
+    """會影響轉換結果的選項，作為快取 key 的一部分"""
+    return {
+        "url": str(vlm_options.url),
+        "params": vlm_options.params,
+        "prompt": vlm_options.prompt,
+        "scale": vlm_options.scale,
+    }
+
 def run_idp_process():
     # 路徑設定
     cw_dir = Path("/home/pc-49/Desktop/nutc25041lab_hw/CW/")
@@ -46,29 +78,29 @@ def run_idp_process():
 
     print("--- [IDP Step 1: 初始化 ws-02 伺服器配置] ---")
     
-    # 配置 Pipeline 選項
+    # 配置 Pipeline 選項 (轉換器等到真的有頁面要轉換時才建立)
     vlm_options = get_vlm_options()
-    pipeline_options = VlmPipelineOptions(
-        vlm_options=vlm_options,
-        enable_remote_services=True 
-    )
+    doc_converter = None
+    cache = ConversionCache()
 
-    # 建立轉換器，指定 PDF 使用 VlmPipeline
-    doc_converter = DocumentConverter(
-        format_options={
-            InputFormat.PDF: PdfFormatOption(
-                pipeline_options=pipeline_options,
-                pipeline_cls=VlmPipeline
-            )
-        }
-    )
+    def convert_fn(path, page_numbers):
+        nonlocal doc_converter
+        doc_converter = doc_converter or build_converter(vlm_options)
+        # 部分失敗的頁不回傳，快取就不會把空白頁當成結果，下次執行會重試
+        if page_numbers is None:
+            return docling_pages(doc_converter.convert(path))
+        pages = {}
+        for p in page_numbers:
+            pages.update(docling_pages(doc_converter.convert(path, page_range=(p, p)), [p]))
+        return pages
 
     print(f"--- [IDP Step 2: 正在處理 {input_pdf.name} (Gemma-3-27B) ...] ---")
     
     try:
-        # 開始轉換
-        result = doc_converter.convert(input_pdf)
-        md_content = result.document.export_to_markdown()
+        # 開始轉換 (逐頁查快取，只有新頁面或被修改的頁面才送到 VLM)
+        pages = convert_pdf_cached(input_pdf, convert_fn, cache, "docling-vlm", cache_options(vlm_options))
+        md_content = "\n\n".join(p for p in pages if p)
+        print(f"📦 快取命中 {cache.hits} 頁 / 重新轉換 {cache.misses} 頁")
 
         # 儲存結果
         with open(output_md, "w", encoding="utf-8") as f:
@@ -80,5 +112,58 @@ def run_idp_process():
     except Exception as e:
         logger.error(f"❌ 發生錯誤: {e}", exc_info=True)
 
+def run_idp_process_paged(concurrency: int = 4):
+    """
+    逐頁模式：每頁各自送到 VLM 端點 (有上限的併發數)，單頁遇到 5xx/524 會自行重試，
+    完成的頁面寫入 checkpoint，中斷後重跑只會補轉未完成的頁面
+    """
+    cw_dir = Path("/home/pc-49/Desktop/nutc25041lab_hw/CW/")
+    input_pdf = cw_dir / "sample_table.pdf"
+    output_md = cw_dir / "homework6_output.md"
+    checkpoint_dir = cw_dir / ".checkpoints" / input_pdf.stem
+
+    if not input_pdf.exists():
+        logger.error(f"❌ 找不到輸入檔案：{input_pdf}")
+        return
+
+    vlm_options = get_vlm_options()
+    print(f"--- [IDP 逐頁模式: {input_pdf.name}，併發 {concurrency}] ---")
+    try:
+        pages = convert_pages(
+            input_pdf, str(vlm_options.url), vlm_options.params, vlm_options.prompt, checkpoint_dir,
+            concurrency=concurrency, scale=vlm_options.scale, timeout=vlm_options.timeout,
+        )
+    except RuntimeError as e:
+        logger.error(f"❌ {e}")
+        return
+
+    with open(output_md, "w", encoding="utf-8") as f:
+        f.write("\n\n".join(p for p in pages if p))
+    print(f"✅ 結果已儲存至: {output_md}")
+
+def run_idp_batch(patterns, output_dir="converted"):
+    """
+    批次模式：只建立一次 VLM 轉換器，以 convert_all 依序處理目錄/glob 中的所有 PDF，
+    每份完成就寫出 Markdown，單份失敗不會中斷整批
+    """
+    cw_dir = Path("/home/pc-49/Desktop/nutc25041lab_hw/CW/")
+    inputs = expand_inputs(patterns, exts=(".pdf",))
+    if not inputs:
+        logger.error(f"❌ 找不到符合的 PDF：{patterns}")
+        return
+
+    print(f"--- [IDP 批次模式: {len(inputs)} 份 PDF] ---")
+    doc_converter = build_converter(get_vlm_options())
+    report = convert_batch(doc_converter, inputs, str(cw_dir / output_dir), skip_existing=True)
+    for entry in report:
+        if not entry["output"]:
+            logger.error(f"❌ {entry['file']}: {entry['status']} {entry['errors']}")
+
 if __name__ == "__main__":
-    run_idp_process()
\ No newline at end of file
+    if "--paged" in sys.argv:
+        run_idp_process_paged()
+    elif "--batch" in sys.argv:
+        # 例如：python CW/06.py --batch "CW/*.pdf"
+        run_idp_batch(sys.argv[sys.argv.index("--batch") + 1:] or ["/home/pc-49/Desktop/nutc25041lab_hw/CW/"])
+    else:
+        run_idp_process()
\ No newline at end of file
@@ -1,10 +1,21 @@
 import os
+import sys
 import pandas as pd
 import requests
 import re
-import time  # 新增：用於重試等待
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
+from qdrant_client.models import Distance, QueryRequest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from common.embed_cache import get_default_cache
+from common.async_embed import embed_concurrently
+from common.chunking import METHODS as CHUNK_METHODS, iter_chunks, iter_file_chunks
+from common.point_ids import chunk_point_id
+from common.bulk_upsert import batched, stream_upsert
+from common.numpy_index import NumpyIndex
+from common.quantization import search_params
+from common.collection_schema import apply as apply_schema
+from common.schemas import day5_grid
 
 # --- 基礎設定 ---
 EMBED_API_URL = "https://ws-04.wade0426.me/embed"
@@ -18,84 +29,66 @@ OUTPUT_FILE = os.path.join(BASE_DIR, "1111232039_RAG_HW_Final.csv")
 
 client = QdrantClient(url=QDRANT_URL)
 
-def get_embedding(texts):
+EMBED_TASK = "檢索技術文件"
+EMBED_CONCURRENCY = int(os.environ.get("EMBED_CONCURRENCY", 8))  # 同時在路上的批次數
+EMBED_STREAM_BATCH = 512  # 串流匯入時每次向量化的 chunk 數
+
+def fetch_embedding(text_list):
     """
-    整合小批量處理與重試機制，解決 API 超時導致資料缺失的問題
+    以 asyncio 同時送出多個小批次 (共用連線池)，每個批次各自以隨機退避重試；
+    失敗批次以 None 佔位，回傳長度永遠與輸入一致，向量不會與切塊錯位
     """
+    return embed_concurrently(
+        text_list, EMBED_API_URL,
+        batch_size=10,  # 縮小批量，避免伺服器端超時
+        concurrency=EMBED_CONCURRENCY,
+        retries=5,
+        timeout=60,
+        task_description=EMBED_TASK,
+        normalize=True,
+    )
+
+def get_embedding(texts):
+    """先查本地快取，只有快取中沒有的文本才送到 API"""
     if not texts:
         return None
-    
+
     text_list = texts if isinstance(texts, list) else [texts]
-    all_embeddings = []
-    batch_size = 10  # 縮小批量，避免伺服器端超時
-    
-    for i in range(0, len(text_list), batch_size):
-        batch = text_list[i:i+batch_size]
-        payload = {
-            "texts": batch,
-            "task_description": "檢索技術文件",
-            "normalize": True
-        }
-        
-        # 實作重試機制 (最多 5 次)
-        success = False
-        for attempt in range(5):
-            try:
-                # 增加 timeout 到 60 秒
-                response = requests.post(EMBED_API_URL, json=payload, timeout=60)
-                if response.status_code == 200:
-                    all_embeddings.extend(response.json()["embeddings"])
-                    success = True
-                    break
-                else:
-                    print(f"API 狀態碼異常: {response.status_code}，嘗試重試...")
-            except Exception as e:
-                print(f"Embedding 批次 {i//batch_size} 嘗試第 {attempt+1} 次失敗: {e}")
-                time.sleep(2) # 等待 2 秒後重試
-        
-        if not success:
-            print(f"!!! 批次 {i//batch_size} 最終處理失敗，這將導致部分資料缺失 !!!")
-            
-    return all_embeddings if len(all_embeddings) > 0 else None
+    embeddings = get_default_cache().get_or_fetch(
+        text_list, fetch_embedding, model=EMBED_API_URL, task_description=EMBED_TASK, normalize=True
+    )
+    return embeddings if any(v is not None for v in embeddings) else None
 
 def get_chunks(text, method):
-    if method == "固定大小_500":
-        return [text[i:i+500] for i in range(0, len(text), 500)]
-    elif method == "滑動視窗_400_100":
-        size, overlap = 400, 100
-        chunks = []
-        start = 0
-        while start < len(text):
-            chunks.append(text[start:start+size])
-            if start + size >= len(text): break
-            start += (size - overlap)
-        return chunks
-    elif method == "語意切塊_進階":
-        # 語意切塊邏輯
-        sentences = re.split(r'(?<=[。？！\n])', text)
-        refined_chunks = []
-        current_chunk = ""
-        for s in sentences:
-            if len(current_chunk) + len(s) <= 550:
-                current_chunk += s
-            else:
-                if current_chunk: refined_chunks.append(current_chunk)
-                current_chunk = s
-        if current_chunk: refined_chunks.append(current_chunk)
-        return refined_chunks
-    return []
-
-def vector_retrieve(question, collection_name):
-    # 檢索單一問題時通常不批次，但共用同個 Embedding 函數
-    emb_res = get_embedding(question)
-    if not emb_res: return {"text": "Error"}
-    
-    search_result = client.query_points(
+    # 切塊邏輯統一由串流切塊引擎處理 (O(n)，結果與原本全文切法相同)
+    if method not in CHUNK_METHODS:
+        return []
+    return [c.text for c in iter_chunks(text, method)]
+
+def embed_questions(questions):
+    """所有問題一次向量化 (走快取)；失敗的位置為 None"""
+    try:
+        vectors = get_embedding(list(questions))
+    except Exception:
+        vectors = None
+    return vectors or [None] * len(questions)
+
+def batch_retrieve(q_vecs, collection_name):
+    """
+    以一次 query_batch_points 檢索所有問題 (每題取最相近的 1 筆)；
+    向量化失敗的問題回傳 Error
+    """
+    valid = [i for i, v in enumerate(q_vecs) if v is not None]
+    responses = client.query_batch_points(
         collection_name=collection_name,
-        query=emb_res[0],
-        limit=1
-    ).points
-    return {"text": search_result[0].payload["text"]} if search_result else {"text": "None"}
+        requests=[QueryRequest(query=q_vecs[i], limit=1, with_payload=True, params=search_params()) for i in valid],
+    ) if valid else []
+
+    retrieved = [{"text": "Error"}] * len(q_vecs)
+    for i, response in zip(valid, responses):
+        points = response.points
+        retrieved[i] = {"text": points[0].payload["text"]} if points else {"text": "None"}
+    return retrieved
 
 def submit_homework(q_id, answer):
     clean_answer = " ".join(answer.split())
@@ -105,17 +98,92 @@ def submit_homework(q_id, answer):
         return response.json().get("score", 0)
     except: return 0
 
-def main():
+def iter_method_points(docs, method, sources_by_id):
+    """
+    串流產生某切塊方法的 (id, vector, payload)，記憶體只保留一個向量化批次。
+    相同內容的 chunk 只產生第一次，之後出現的來源記錄在 sources_by_id
+    """
+    for d in docs:
+        missing = total = 0
+        for group in batched(iter_file_chunks(d['path'], method), EMBED_STREAM_BATCH):
+            vectors = get_embedding([c.text for c in group]) or [None] * len(group)
+            total += len(group)
+            # 向量與 chunk 一一對應，失敗的位置是 None，只跳過該 chunk
+            for chunk, vec in zip(group, vectors):
+                if vec is None:
+                    missing += 1
+                    continue
+                point_id = chunk_point_id(chunk.text, strategy=method)
+                sources = sources_by_id.get(point_id)
+                if sources is None:
+                    sources_by_id[point_id] = [d['source']]
+                    yield point_id, vec, {"text": chunk.text, "sources": [d['source']]}
+                elif d['source'] not in sources:
+                    sources.append(d['source'])
+        if missing:
+            print(f"   - 警告: {d['source']} 有 {missing}/{total} 個 chunk 向量化失敗，已略過")
+
+def merge_duplicate_sources(col_name, sources_by_id):
+    """相同內容出現在多個來源時，補寫完整的來源清單"""
+    for point_id, sources in sources_by_id.items():
+        if len(sources) > 1:
+            client.set_payload(collection_name=col_name, payload={"sources": sources}, points=[point_id])
+
+LOCAL_METRICS = {"Cosine": "cosine", "Euclid": "euclid", "Dot": "dot"}
+
+def evaluate_local(docs, methods, metrics, questions_df, q_vecs):
+    """
+    以 NumpyIndex 取代每組 (切塊 × 度量) 各一個 collection：每種切塊只建一份向量矩陣，
+    向量已正規化時 (normalize=True) 三種度量排名等價，只排序一次
+    """
+    results = []
+    valid = [i for i, v in enumerate(q_vecs) if v is not None]
+    for method in methods:
+        print(f"\n>>> 正在處理切塊方法: {method} (本地單一副本)")
+        index, sources_by_id = None, {}
+        for group in batched(iter_method_points(docs, method, sources_by_id), EMBED_STREAM_BATCH):
+            ids, vectors, payloads = zip(*group)
+            index = index or NumpyIndex(len(vectors[0]))
+            index.add(vectors, payloads=list(payloads), ids=list(ids))
+        if index is None:
+            continue
+        # 與 Qdrant 路徑的 merge_duplicate_sources 相同：相同內容的點補上完整來源清單
+        for point_id, sources in sources_by_id.items():
+            if len(sources) > 1:
+                index.set_payload(point_id, {"sources": sources})
+        print(f"   - {len(index)} 筆向量，已正規化: {index.is_normalized()}")
+
+        hits_by_metric = index.search_batch_metrics(
+            [q_vecs[i] for i in valid], [LOCAL_METRICS[m] for m in metrics], limit=1
+        )
+        for metric_name in metrics:
+            retrieved_all = [{"text": "Error"}] * len(q_vecs)
+            for i, hits in zip(valid, hits_by_metric[LOCAL_METRICS[metric_name]]):
+                retrieved_all[i] = {"text": hits[0].payload["text"]} if hits else {"text": "None"}
+            for q_id, retrieved in zip(questions_df['q_id'], retrieved_all):
+                score = submit_homework(q_id, retrieved['text'])
+                results.append({
+                    "method": method,
+                    "metric": metric_name,
+                    "q_id": q_id,
+                    "score": score
+                })
+    return results
+
+def main(local=False):
     # 1. 準備資料
-    docs = []
-    for file_path in DATA_FILES:
-        if os.path.exists(file_path):
-            with open(file_path, 'r', encoding='utf-8-sig') as f:
-                docs.append({"source": os.path.basename(file_path), "content": f.read()})
+    # 只記錄路徑，切塊時再串流讀檔，不必把整份文件載入記憶體
+    docs = [
+        {"source": os.path.basename(file_path), "path": file_path}
+        for file_path in DATA_FILES if os.path.exists(file_path)
+    ]
     
     questions_df = pd.read_csv(QUESTIONS_FILE)
     results = []
 
+    # 所有問題只向量化一次，9 組 (切塊 × 度量) 共用
+    q_vecs = embed_questions(questions_df['questions'].tolist())
+
     # 2. 定義測試組合
     methods = ["固定大小_500", "滑動視窗_400_100", "語意切塊_進階"]
     metrics = {
@@ -126,55 +194,46 @@ def main():
 
     # 先取得一個範例維度
     sample_emb = get_embedding("測試")
-    v_size = len(sample_emb[0]) if sample_emb else 4096
+    v_size = len(sample_emb[0]) if sample_emb and sample_emb[0] else 4096
     print(f"確認向量維度: {v_size}")
 
+    # 三種切塊方法的 chunk 依序串流，每 EMBED_STREAM_BATCH 筆一次並行向量化寫入快取，
+    # 之後各方法產生 point 時都直接命中快取
+    all_chunks = (c.text for method in methods for d in docs for c in iter_file_chunks(d['path'], method))
+    print(f"並行向量化所有 chunk (同時 {EMBED_CONCURRENCY} 批)...")
+    for group in batched(all_chunks, EMBED_STREAM_BATCH):
+        get_embedding(group)
+
     # 3. 雙層迴圈開始測試
-    for method in methods:
-        print(f"\n>>> 正在處理切塊方法: {method}")
-        all_data_points = []
-        
-        # 針對當前切塊方法，處理所有文件的向量
-        for d in docs:
-            chunks = get_chunks(d['content'], method)
-            vectors = get_embedding(chunks) # 內部已實作批量處理
+    if local:
+        # 實驗模式：每種切塊的向量只存一份 (本地矩陣)，三種度量都從同一份算出
+        results = evaluate_local(docs, methods, metrics, questions_df, q_vecs)
+    else:
+        for method in methods:
+            print(f"\n>>> 正在處理切塊方法: {method}")
+
+            # 套用到三種距離度量
+            for metric_name in metrics:
+                print(f"   --- 測試度量方式: {metric_name} ---")
+                col_name = f"col_{re.sub(r'[^a-zA-Z0-9]', '_', method)}_{metric_name.lower()}"
             
-            if vectors and len(vectors) == len(chunks):
-                for i in range(len(chunks)):
-                    all_data_points.append({
-                        "vector": vectors[i],
-                        "text": chunks[i]
+                apply_schema(client, day5_grid(col_name, v_size, metric_name.lower()), recreate=True)
+
+                # 串流批量寫入 Qdrant (依筆數與位元組切批、平行上傳)
+                sources_by_id = {}
+                stream_upsert(client, col_name, iter_method_points(docs, method, sources_by_id))
+                merge_duplicate_sources(col_name, sources_by_id)
+
+                # 檢索並評分 (每個庫一次批次查詢)
+                retrieved_all = batch_retrieve(q_vecs, col_name)
+                for q_id, retrieved in zip(questions_df['q_id'], retrieved_all):
+                    score = submit_homework(q_id, retrieved['text'])
+                    results.append({
+                        "method": method,
+                        "metric": metric_name,
+                        "q_id": q_id,
+                        "score": score
                     })
-                print(f"   - {d['source']} 處理完成")
-            else:
-                print(f"   - 錯誤: {d['source']} 資料向量化不完整")
-
-        # 套用到三種距離度量
-        for metric_name, dist_type in metrics.items():
-            print(f"   --- 測試度量方式: {metric_name} ---")
-            col_name = f"col_{re.sub(r'[^a-zA-Z0-9]', '_', method)}_{metric_name.lower()}"
-            
-            if client.collection_exists(col_name): client.delete_collection(col_name)
-            client.create_collection(col_name, vectors_config=VectorParams(size=v_size, distance=dist_type))
-
-            # 批次寫入 Qdrant
-            points = [
-                PointStruct(id=idx, vector=p["vector"], payload={"text": p["text"]})
-                for idx, p in enumerate(all_data_points)
-            ]
-            client.upsert(collection_name=col_name, points=points)
-
-            # 檢索並評分
-            for _, row in questions_df.iterrows():
-                q_id, question = row['q_id'], row['questions']
-                retrieved = vector_retrieve(question, col_name)
-                score = submit_homework(q_id, retrieved['text'])
-                results.append({
-                    "method": method,
-                    "metric": metric_name,
-                    "q_id": q_id,
-                    "score": score
-                })
 
     # 4. 統計與輸出
     df = pd.DataFrame(results)
@@ -185,6 +244,7 @@ def main():
     summary = df.groupby(['method', 'metric'])['score'].mean().unstack()
     print(summary)
     print("="*40)
+    print(f"Embedding 快取統計: {get_default_cache().stats()}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main(local="--local" in sys.argv)
\ No newline at end of file
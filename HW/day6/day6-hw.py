@@ -1,6 +1,7 @@
+import os
+import sys
 import requests
 import pandas as pd
-import uuid
 import time
 from docx import Document
 from qdrant_client import QdrantClient, models
@@ -9,12 +10,23 @@ from deepeval.metrics import FaithfulnessMetric
 from deepeval.test_case import LLMTestCase
 from deepeval.models.base_model import DeepEvalBaseLLM
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from common.embed_cache import get_default_cache
+from common.ingest_manifest import IngestManifest
+from common.point_ids import chunk_point_id
+from common.bm25_sparse import BM25SparseEncoder
+from common.quantization import search_params
+from common.collection_schema import apply as apply_schema
+from common.schemas import water_qa_hw
+
 # --- 1. 配置與初始化 ---
 QDRANT_URL = "http://localhost:6333"
 LLM_BASE_URL = "https://ws-03.wade0426.me/v1"
 EMBED_API_URL = "https://ws-04.wade0426.me/embed"
 MODEL_NAME = "/models/gpt-oss-120b"
 COLLECTION_NAME = "water_qa_hw"
+DENSE_PREFETCH = 3   # 稀疏端有真正的 BM25 分數後，dense 候選不必再取那麼多
+SPARSE_PREFETCH = 5
 
 client = QdrantClient(url=QDRANT_URL)
 llm_client = OpenAI(base_url=LLM_BASE_URL, api_key="no-key")
@@ -33,59 +45,93 @@ custom_eval_model = CustomLLM(model_name=MODEL_NAME)
 
 # --- 2. 工具函數 ---
 
-def get_embeddings(texts):
+def fetch_embeddings(texts):
     res = requests.post(EMBED_API_URL, json={"texts": texts, "task_description": "檢索台水文件", "normalize": True})
     return res.json()["embeddings"]
 
+def get_embeddings(texts):
+    # 重跑實驗時已算過的段落直接從本地快取取出
+    return get_default_cache().get_or_fetch(
+        texts, fetch_embeddings, model=EMBED_API_URL, task_description="檢索台水文件", normalize=True
+    )
+
+# 本地 BM25 編碼 (中文 bigram)；文件端與查詢端使用同一套切詞
+sparse_encoder = BM25SparseEncoder()
+
 def hybrid_search(query_text):
+    # 問題逐題依序處理，直接呼叫 (沒有併發查詢可合併，不經微批次閘道)
     vector = get_embeddings([query_text])[0]
+    prefetch = [models.Prefetch(query=vector, using="dense", limit=DENSE_PREFETCH, params=search_params())]
+    sparse_query = sparse_encoder.query_vector(query_text)
+    if sparse_query.indices:  # 查詢切不出任何 token 時只走 dense
+        prefetch.append(models.Prefetch(query=sparse_query, using="sparse", limit=SPARSE_PREFETCH))
     search_result = client.query_points(
         collection_name=COLLECTION_NAME,
-        prefetch=[
-            models.Prefetch(query=vector, using="dense", limit=5),
-            models.Prefetch(query=models.SparseVector(indices=[1], values=[1.0]), using="sparse", limit=5),
-        ],
+        prefetch=prefetch,
         query=models.FusionQuery(fusion=models.Fusion.RRF),
         limit=3
     )
     return [hit.payload['text'] for hit in search_result.points]
 
-# --- 3. 執行流程 ---
+# --- 3. 資料匯入 ---
 
-if __name__ == "__main__":
-    # --- A. 資料匯入 (含分批邏輯解決 400 錯誤) ---
-    print("Step 1: 正在讀取並匯入資料...")
-    doc = Document("qa_data.docx")
-    paragraphs = [p.text.strip() for p in doc.paragraphs if len(p.text.strip()) > 10]
-    
-    # 取得第一筆確認維度
-    first_embedding = get_embeddings(paragraphs[:1])[0]
-    vector_dim = len(first_embedding)
+def ingest(doc_path="qa_data.docx", rebuild=False):
+    """增量匯入：manifest 比對檔案與段落雜湊，只向量化新增/變更的段落，並刪除已消失的段落"""
+    # 取得向量維度 (已算過時直接命中快取)
+    vector_dim = len(get_embeddings(["test"])[0])
+    manifest = IngestManifest(COLLECTION_NAME, config={
+        "embed_url": EMBED_API_URL, "dim": vector_dim, "sparse": sparse_encoder.config(), "min_len": 10,
+        "point_ids": "uuid5-content"
+    })
 
-    if client.collection_exists(COLLECTION_NAME):
-        client.delete_collection(COLLECTION_NAME)
-    
-    client.create_collection(
-        collection_name=COLLECTION_NAME,
-        vectors_config={"dense": models.VectorParams(size=vector_dim, distance=models.Distance.COSINE)},
-        sparse_vectors_config={"sparse": models.SparseVectorParams(modifier=models.Modifier.IDF)}
-    )
+    # schema 設定 (量化 / HNSW) 有變時就地調整；只有向量結構改變或需要全量匯入時才重建
+    if apply_schema(client, water_qa_hw(vector_dim), recreate=rebuild or manifest.reset) in ("created", "recreated"):
+        print("全量匯入")
+        manifest.clear()
+
+    key = os.path.basename(doc_path)
+    fingerprint = manifest.check(key, doc_path)
+    if fingerprint is None:
+        print(f"{key} 未變動，略過匯入")
+        return
+
+    doc = Document(doc_path)
+    paragraphs = [p.text.strip() for p in doc.paragraphs if len(p.text.strip()) > 10]
+    # 相同段落得到相同 id (uuid5)，重跑 upsert 冪等，重複段落只存一點
+    make_id = lambda text, _: chunk_point_id(text, strategy="paragraph")
+    new_items, stale_ids = manifest.sync_file(key, fingerprint, paragraphs, make_id=make_id)
+    new_items = list({pid: (pid, idx, t) for pid, idx, t in new_items}.values())
+    referenced = manifest.id_sources()
+    stale_ids = [pid for pid in dict.fromkeys(stale_ids) if pid not in referenced]
+    print(f"段落共 {len(paragraphs)} 筆：需匯入 {len(new_items)} 筆，需刪除 {len(stale_ids)} 筆")
 
     # 分批轉換與寫入 (每 100 筆一組，避免 Payload 太大)
     chunk_size = 100
-    for i in range(0, len(paragraphs), chunk_size):
-        batch_texts = paragraphs[i:i+chunk_size]
+    for i in range(0, len(new_items), chunk_size):
+        batch = new_items[i:i+chunk_size]
+        batch_texts = [t for _, _, t in batch]
         batch_vecs = get_embeddings(batch_texts)
         
         points = [
             models.PointStruct(
-                id=str(uuid.uuid4()),
-                vector={"dense": v, "sparse": models.Document(text=t, model="Qdrant/bm25")},
+                id=pid,
+                vector={"dense": v, "sparse": sparse_encoder.document_vector(t)},
                 payload={"text": t}
-            ) for t, v in zip(batch_texts, batch_vecs)
+            ) for (pid, _, t), v in zip(batch, batch_vecs)
         ]
         client.upsert(collection_name=COLLECTION_NAME, points=points)
-        print(f"匯入進度: {min(i+chunk_size, len(paragraphs))}/{len(paragraphs)}")
+        print(f"匯入進度: {min(i+chunk_size, len(new_items))}/{len(new_items)}")
+
+    if stale_ids:
+        client.delete(collection_name=COLLECTION_NAME, points_selector=models.PointIdsList(points=stale_ids))
+    manifest.save()
+
+# --- 4. 執行流程 ---
+
+if __name__ == "__main__":
+    # --- A. 資料匯入 (增量，加上 --rebuild 可強制全量重建) ---
+    print("Step 1: 正在讀取並匯入資料...")
+    ingest(rebuild="--rebuild" in sys.argv)
 
     # --- B. 執行前三題驗證 ---
     print("\nStep 2: 開始執行前三題評測...")
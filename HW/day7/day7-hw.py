@@ -1,20 +1,29 @@
 import os
+import sys
 import pandas as pd
 import json
-import io
-import fitz  # PyMuPDF
 from docx import Document
 from rapidocr_onnxruntime import RapidOCR
-from PIL import Image
-import numpy as np
 from openai import OpenAI
-from sentence_transformers import SentenceTransformer
 from qdrant_client import QdrantClient
-from qdrant_client.http.models import Distance, VectorParams, PointStruct
+from qdrant_client.http.models import PointStruct
 from deepeval.metrics import FaithfulnessMetric, AnswerRelevancyMetric
 from deepeval.test_case import LLMTestCase
 from deepeval.models.base_model import DeepEvalBaseLLM
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from common.embed_backends import make_backend
+from common.pdf_extract import PageOCRPool, extract_pdf_hybrid
+from common.inverted_index import InvertedIndex, rrf_fuse
+from common.chunk_store import ChunkStore
+from common.chunking import iter_chunks
+from common.point_ids import chunk_point_id
+from common.collection_schema import apply as apply_schema
+from common.schemas import ultimate_context_rag
+
+CHUNK_METHOD = "滑動視窗_400_100"
+CONTEXT_CHARS = 2400  # 每題送給 LLM 的 context 上限 (字元)
+
 # --- 1. DeepEval 自定義模型介面 ---
 class MyCustomModel(DeepEvalBaseLLM):
     def __init__(self, model_name, api_key, base_url):
@@ -41,9 +50,16 @@ class FinalSmartSecureRAG:
         self.client = OpenAI(base_url=self.llm_url, api_key=self.api_key)
         self.qdrant = QdrantClient(url="http://localhost:6333")
         self.collection_name = "ultimate_context_rag"
-        self.embed_model = SentenceTransformer("paraphrase-multilingual-MiniLM-L12-v2")
+        # EMBED_BACKEND=torch / onnx-int8 可切換本地推論方式 (CPU 離線可用)
+        self.embed_model = make_backend(model_name="paraphrase-multilingual-MiniLM-L12-v2")
         self.eval_model = MyCustomModel(self.model_name, self.api_key, self.llm_url)
         self.rapid_ocr = RapidOCR()
+        self.ocr_pool = PageOCRPool()
+        # 關鍵字倒排索引 (產品名、製程代號等 dense 容易漏掉的詞)
+        self.lexical = InvertedIndex.open(self.collection_name)
+        # QDRANT_PAYLOAD=ids 時 Qdrant 只存 id，全文從本地 chunk store (mmap) 取回
+        self.payload_mode = os.environ.get("QDRANT_PAYLOAD", "full")
+        self.chunk_store = ChunkStore.open(self.collection_name)
 
     def security_audit(self, text, filename):
         """[高精度審核] 修正誤判問題，區分問答集與指令注入"""
@@ -84,22 +100,28 @@ class FinalSmartSecureRAG:
             if name.endswith('.docx'):
                 text = "\n".join([p.text for p in Document(path).paragraphs])
             elif name.endswith('.pdf'):
-                doc = fitz.open(path)
-                for page in doc:
-                    pix = page.get_pixmap()
-                    img = Image.open(io.BytesIO(pix.tobytes("png")))
-                    res, _ = self.rapid_ocr(np.array(img))
-                    if res: text += "\n".join([l[1] for l in res])
+                # 逐頁判斷：有文字層的頁面直接讀取，掃描頁才交給平行 OCR
+                text, _ = extract_pdf_hybrid(path, self.ocr_pool)
             else:
                 res, _ = self.rapid_ocr(path)
                 if res: text = "\n".join([l[1] for l in res])
         except: pass
         return text
 
+    @staticmethod
+    def chunk_id(parent, seq):
+        """由 (文件, 序號) 決定 chunk id，檢索到某段時可直接算出前後段的 id"""
+        return chunk_point_id("", strategy=CHUNK_METHOD, source=parent, offset=seq, dedupe=False)
+
+    @staticmethod
+    def doc_id(parent):
+        return f"doc:{parent}"
+
     def ingest(self):
         targets = ["1.pdf", "2.pdf", "3.pdf", "4.png", "5.docx"]
         points = []
-        p_id = 0
+        self.lexical.clear()
+        self.chunk_store.clear()
         print("\n🛡️ 啟動安全掃描與入庫流程...")
         for f in targets:
             path = self.found_files.get(f)
@@ -113,18 +135,82 @@ class FinalSmartSecureRAG:
             
             print(f"✅ [通過] {f}")
             if content.strip():
-                # 稍微增加 context 長度以利檢索準確度
-                vec = self.embed_model.encode(content[:1200]).tolist()
-                points.append(PointStruct(id=p_id, vector=vec, payload={"source": f, "content": content}))
-                p_id += 1
-
-        if self.qdrant.collection_exists(self.collection_name):
-            self.qdrant.delete_collection(self.collection_name)
-        self.qdrant.create_collection(self.collection_name, VectorParams(size=384, distance=Distance.COSINE))
+                # 整份文件只存在本地 chunk store (需要時才取)；向量庫以 chunk 為單位，各自帶 parent
+                self.chunk_store.put(self.doc_id(f), content, source=f)
+                chunks = list(iter_chunks(content, CHUNK_METHOD, source=f))
+                vectors = self.embed_model.embed([c.text for c in chunks])
+                for seq, (chunk, vec) in enumerate(zip(chunks, vectors)):
+                    cid = self.chunk_id(f, seq)
+                    meta = {"source": f, "parent": f, "seq": seq, "start": chunk.start, "end": chunk.end}
+                    payload = {**meta, "text": chunk.text} if self.payload_mode == "full" else None
+                    points.append(PointStruct(id=cid, vector=vec, payload=payload))
+                    self.lexical.add(cid, chunk.text)
+                    self.chunk_store.put(cid, chunk.text, **meta)
+                print(f"   - {len(chunks)} 個 chunk")
+
+        apply_schema(self.qdrant, ultimate_context_rag(self.embed_model.dimension), recreate=True)
         if points: self.qdrant.upsert(self.collection_name, points)
+        self.lexical.save()
+        self.chunk_store.flush()
+
+    def retrieve(self, q, top_k=4, candidates=10):
+        """dense 與關鍵字檢索各取 chunk 候選，以 RRF 融合後回傳前 top_k 個 chunk 的中繼資料"""
+        dense_hits = self.qdrant.query_points(self.collection_name, query=self.embed_model.embed_one(q), limit=candidates,
+                                              with_payload=False).points
+        lexical_hits = self.lexical.search(q, candidates)
+        fused = rrf_fuse([[p.id for p in dense_hits], [i for i, _ in lexical_hits]], limit=top_k)
+        return [self.chunk_store.meta(i) for i, _ in fused if i in self.chunk_store]
+
+    def build_context(self, hits, window=1, max_chars=CONTEXT_CHARS):
+        """
+        把命中的 chunk 連同前後 window 段合併成連續區間 (相鄰/重疊的合併)，
+        區間依其中最佳命中的排名加入 (跨文件一起排序)，總長度不超過 max_chars；
+        回傳 ([區間文字], 排名第一的來源)。
+        區間由相鄰 chunk 的文字拼接，依 start / end 去掉滑動視窗的重疊部分，不需要讀取整份文件
+        """
+        seqs, hit_rank = {}, {}
+        for rank, hit in enumerate(hits):
+            parent, seq = hit["parent"], hit["seq"]
+            hit_rank.setdefault((parent, seq), rank)
+            seqs.setdefault(parent, set()).update(
+                s for s in range(seq - window, seq + window + 1) if self.chunk_id(parent, s) in self.chunk_store)
+
+        ranked_runs = []  # (區間內最佳命中的排名, parent, [seq...])
+        for parent, parent_seqs in seqs.items():
+            runs = []
+            for seq in sorted(parent_seqs):
+                if runs and seq == runs[-1][-1] + 1:
+                    runs[-1].append(seq)
+                else:
+                    runs.append([seq])
+            for run in runs:
+                ranked_runs.append((min(hit_rank.get((parent, s), len(hits)) for s in run), parent, run))
+        ranked_runs.sort(key=lambda r: r[0])
+
+        contexts, used = [], 0
+        for _, parent, run in ranked_runs:
+            if used >= max_chars:
+                break
+            parts, pos = [], None
+            for seq in run:
+                cid = self.chunk_id(parent, seq)
+                meta = self.chunk_store.meta(cid)
+                text = self.chunk_store.get(cid)
+                pos = meta["start"] if pos is None else pos
+                parts.append(text[max(0, pos - meta["start"]):])
+                pos = max(pos, meta["end"])
+            text = "".join(parts)[:max_chars - used]
+            contexts.append(text)
+            used += len(text)
+        return contexts, (hits[0]["parent"] if hits else "None")
+
+    def resolve_document(self, parent):
+        """整份文件 (只在 FULL_DOC_CONTEXT=1 時使用)"""
+        return self.chunk_store.get(self.doc_id(parent), "")
 
     def run(self):
         self.ingest()
+        self.ocr_pool.close()
         test_csv = self.found_files.get("test_dataset.csv")
         gold_csv = self.found_files.get("questions_answer(1).csv")
         
@@ -140,10 +226,11 @@ class FinalSmartSecureRAG:
         print("\n📝 執行 RAG 檢索與產出符合格式的 CSV...")
         for i, row in test_df.head(5).iterrows():
             q = row['questions']
-            query_res = self.qdrant.query_points(self.collection_name, query=self.embed_model.encode(q).tolist(), limit=1).points
-            
-            context = query_res[0].payload["content"] if query_res else "無資料"
-            source_file = query_res[0].payload["source"] if query_res else "None"
+            # chunk 級檢索，命中段落連同前後段合併成有上限的 context；FULL_DOC_CONTEXT=1 時改送整份文件
+            contexts, source_file = self.build_context(self.retrieve(q))
+            if os.environ.get("FULL_DOC_CONTEXT") == "1" and source_file != "None":
+                contexts = [self.resolve_document(source_file)]
+            context = "\n...\n".join(contexts) if contexts else "無資料"
             
             ans = self.client.chat.completions.create(
                 model=self.model_name, messages=[{"role": "user", "content": f"資料：{context}\n問題：{q}"}]
@@ -157,7 +244,7 @@ class FinalSmartSecureRAG:
                 "source": source_file
             })
             
-            case = LLMTestCase(input=q, actual_output=ans, expected_output=str(gold_df.iloc[i][ans_col]), retrieval_context=[context])
+            case = LLMTestCase(input=q, actual_output=ans, expected_output=str(gold_df.iloc[i][ans_col]), retrieval_context=contexts or [context])
             print(f"\n[Q{i+1}] {q[:20]}...")
             for m in metrics:
                 try: m.measure(case); print(f" - {m.__class__.__name__}: {m.score:.2f}")
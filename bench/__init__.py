@@ -0,0 +1 @@
+"""效能比較腳本 (皆使用本地替身伺服器或本地資料，不依賴外部服務)。"""
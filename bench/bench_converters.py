@@ -0,0 +1,124 @@
+"""
+PDF 轉換器成本/品質比較：對目錄中所有 PDF 逐一以各轉換器處理，記錄
+冷啟動時間、頁/秒、每頁延遲 p50/p95、峰值 RSS，以及與參考答案的文字相似度。
+每個轉換器在獨立子程序執行，冷啟動與 RSS 才不會互相影響。
+頁/秒與相似度以整份轉換計算；每頁延遲另外逐頁呼叫 convert_selected_pages 實測，
+只支援整份轉換的轉換器 (markitdown) 不列每頁延遲。
+
+    python bench/bench_converters.py --pdf-dir CW --reference-dir CW/references
+參考答案為 <reference-dir>/<PDF 檔名>.md；找不到時該文件不計相似度。
+"""
+import os
+import re
+import sys
+import csv
+import glob
+import time
+import argparse
+import difflib
+import resource
+import multiprocessing as mp
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from common.converters import CONVERTERS, get_converter
+
+
+def normalize_text(text):
+    """去掉 Markdown 符號與空白差異，只比較文字內容"""
+    text = re.sub(r"[#*_`|>\-]+", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def similarity(text, reference):
+    return difflib.SequenceMatcher(None, normalize_text(text), normalize_text(reference), autojunk=False).ratio()
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def run_converter(name, pdf_paths, reference_dir, queue):
+    converter = get_converter(name)
+    start = time.perf_counter()
+    converter.load()
+    cold_start = time.perf_counter() - start
+
+    page_latencies, total_pages, total_sec, scores, failures = [], 0, 0.0, [], 0
+    for path in pdf_paths:
+        start = time.perf_counter()
+        try:
+            pages = converter.convert_pages(path)
+        except Exception as e:
+            print(f"   ❌ [{name}] {os.path.basename(path)}: {e}")
+            failures += 1
+            continue
+        total_sec += time.perf_counter() - start
+        total_pages += len(pages)
+
+        if converter.page_level:
+            for page_no in range(1, len(pages) + 1):
+                start = time.perf_counter()
+                converter.convert_selected_pages(path, [page_no])
+                page_latencies.append(time.perf_counter() - start)
+
+        ref_path = os.path.join(reference_dir, os.path.basename(path) + ".md") if reference_dir else None
+        if ref_path and os.path.exists(ref_path):
+            with open(ref_path, encoding="utf-8") as f:
+                scores.append(similarity("\n".join(pages), f.read()))
+
+    queue.put({
+        "converter": name,
+        "cold_start": cold_start,
+        "pages": total_pages,
+        "pages_per_sec": total_pages / total_sec if total_sec else 0.0,
+        "p50_ms": percentile(page_latencies, 0.5) * 1000 if page_latencies else None,
+        "p95_ms": percentile(page_latencies, 0.95) * 1000 if page_latencies else None,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "similarity": sum(scores) / len(scores) if scores else None,
+        "failures": failures,
+    })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PDF 轉換器效能/品質比較")
+    parser.add_argument("--pdf-dir", default=os.path.join(os.path.dirname(__file__), "..", "CW"))
+    parser.add_argument("--reference-dir", default=None)
+    parser.add_argument("--converters", default=",".join(CONVERTERS))
+    parser.add_argument("--csv", default=None, help="另存結果 CSV")
+    args = parser.parse_args()
+
+    pdf_paths = sorted(glob.glob(os.path.join(args.pdf_dir, "*.pdf")))
+    if not pdf_paths:
+        sys.exit(f"❌ {args.pdf_dir} 找不到 PDF")
+    print(f"📂 {len(pdf_paths)} 份 PDF：{', '.join(os.path.basename(p) for p in pdf_paths)}\n")
+
+    ctx = mp.get_context("spawn")
+    rows = []
+    for name in args.converters.split(","):
+        queue = ctx.Queue()
+        proc = ctx.Process(target=run_converter, args=(name, pdf_paths, args.reference_dir, queue))
+        proc.start()
+        proc.join()
+        if proc.exitcode != 0:
+            print(f"❌ {name} 執行失敗 (exit {proc.exitcode})")
+            continue
+        rows.append(queue.get())
+
+    print(f"{'轉換器':<12} | {'冷啟動(s)':>9} | {'頁數':>5} | {'頁/秒':>7} | {'p50(ms)':>8} | {'p95(ms)':>8} | "
+          f"{'RSS(MB)':>8} | {'相似度':>6}")
+    print("-" * 92)
+    for r in rows:
+        sim = f"{r['similarity']:.3f}" if r["similarity"] is not None else "-"
+        p50, p95 = (f"{r[k]:.1f}" if r[k] is not None else "-" for k in ("p50_ms", "p95_ms"))
+        print(f"{r['converter']:<12} | {r['cold_start']:>9.2f} | {r['pages']:>5} | {r['pages_per_sec']:>7.2f} | "
+              f"{p50:>8} | {p95:>8} | {r['peak_rss_mb']:>8.0f} | {sim:>6}")
+
+    if args.csv and rows:
+        with open(args.csv, "w", newline="", encoding="utf-8-sig") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"\n💾 結果已儲存至 {args.csv}")
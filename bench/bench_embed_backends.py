@@ -0,0 +1,78 @@
+"""
+比較本地 Embedding 後端 (PyTorch vs ONNX int8) 在 CPU 上的吞吐量、單筆 p95 延遲與記憶體 (RSS)。
+每個 (模型, 後端) 組合在獨立子程序中執行，RSS 才不會互相干擾。
+
+    python bench/bench_embed_backends.py
+"""
+import os
+import re
+import sys
+import time
+import resource
+import multiprocessing as mp
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+MODELS = ["all-MiniLM-L6-v2", "paraphrase-multilingual-MiniLM-L12-v2"]
+BACKEND_KINDS = ["torch", "onnx-int8"]
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "HW", "day5")
+NUM_SINGLE_QUERIES = 100
+
+
+def load_corpus(limit=1000):
+    """以 day5 的 data_0X.txt 依句切分當作測試語料"""
+    texts = []
+    for i in range(1, 6):
+        path = os.path.join(DATA_DIR, f"data_{i:02d}.txt")
+        if os.path.exists(path):
+            with open(path, encoding="utf-8-sig") as f:
+                texts.extend(s.strip() for s in re.split(r"(?<=[。？！\n])", f.read()) if s.strip())
+    while texts and len(texts) < limit:
+        texts = texts + texts
+    return texts[:limit]
+
+
+def run_one(model_name, kind, queue):
+    from common.embed_backends import make_backend
+
+    texts = load_corpus()
+    backend = make_backend(kind, model_name=model_name, batch_size=32)
+
+    start = time.perf_counter()
+    backend.embed(["warm up"])
+    load_sec = time.perf_counter() - start
+
+    start = time.perf_counter()
+    backend.embed(texts)
+    throughput = len(texts) / (time.perf_counter() - start)
+
+    latencies = []
+    for text in texts[:NUM_SINGLE_QUERIES]:
+        start = time.perf_counter()
+        backend.embed_one(text)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux 單位為 KB
+    queue.put({
+        "model": model_name, "backend": kind, "load": load_sec, "tps": throughput,
+        "p95": latencies[int(len(latencies) * 0.95) - 1] * 1000, "rss": rss_mb,
+    })
+
+
+if __name__ == "__main__":
+    ctx = mp.get_context("spawn")
+    print(f"{'模型':<40} | {'後端':<10} | {'載入(s)':>8} | {'筆/秒':>8} | {'p95(ms)':>8} | {'RSS(MB)':>8}")
+    print("-" * 98)
+    for model_name in MODELS:
+        for kind in BACKEND_KINDS:
+            queue = ctx.Queue()
+            proc = ctx.Process(target=run_one, args=(model_name, kind, queue))
+            proc.start()
+            proc.join()
+            if proc.exitcode != 0:
+                print(f"{model_name:<40} | {kind:<10} | ❌ 執行失敗 (exit {proc.exitcode})")
+                continue
+            r = queue.get()
+            print(f"{r['model']:<40} | {r['backend']:<10} | {r['load']:>8.2f} | {r['tps']:>8.1f} | "
+                  f"{r['p95']:>8.1f} | {r['rss']:>8.0f}")
@@ -0,0 +1,69 @@
+import os
+import sys
+import time
+import threading
+import statistics
+
+import requests
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from common.embed_gateway import MicroBatcher
+from bench.stand_in_server import StandInHandler, start_server
+
+# --- 測試參數 ---
+NUM_CLIENTS = int(os.environ.get("NUM_CLIENTS", 64))
+QUERIES_PER_CLIENT = int(os.environ.get("QUERIES_PER_CLIENT", 20))
+
+
+def run_load(label, embed_one):
+    """NUM_CLIENTS 個執行緒同時各送 QUERIES_PER_CLIENT 筆單句查詢"""
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(cid):
+        local = []
+        for q in range(QUERIES_PER_CLIENT):
+            start = time.perf_counter()
+            embed_one(f"使用者 {cid} 的第 {q} 個問題")
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    StandInHandler.request_count = 0
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(NUM_CLIENTS)]
+    start = time.perf_counter()
+    for t in threads: t.start()
+    for t in threads: t.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{label:<16} | {len(latencies) / elapsed:>9.1f} 筆/秒 | p50 {statistics.median(latencies) * 1000:>7.1f} ms"
+          f" | p95 {p95 * 1000:>7.1f} ms | 上游請求 {StandInHandler.request_count:>5} 次")
+    return len(latencies) / elapsed
+
+
+if __name__ == "__main__":
+    server, base_url = start_server()
+    embed_url = f"{base_url}/embed"
+    print(f"📡 替身 /embed: {embed_url} (每請求延遲 {StandInHandler.request_latency * 1000:.0f} ms)")
+    print(f"👥 併發 {NUM_CLIENTS} 個用戶端 × {QUERIES_PER_CLIENT} 筆查詢\n")
+
+    local = threading.local()
+
+    def direct(text):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        return local.session.post(embed_url, json={"texts": [text], "normalize": True}).json()["embeddings"][0]
+
+    upstream = requests.Session()
+
+    def fetch(texts):
+        return upstream.post(embed_url, json={"texts": texts, "normalize": True}).json()["embeddings"]
+
+    base = run_load("逐筆直連", direct)
+    batcher = MicroBatcher(fetch, window_ms=5, max_batch=64)
+    batched = run_load("微批次閘道", batcher.embed)
+    print(f"\n🚀 吞吐量提升 {batched / base:.1f}x，平均批次大小 {batcher.items / max(batcher.batches, 1):.1f}")
+    batcher.close()
+    server.shutdown()
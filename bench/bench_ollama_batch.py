@@ -0,0 +1,47 @@
+import os
+import sys
+import time
+
+import requests
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from common.ollama_embed import embed_batched, embed_one_by_one
+from bench.stand_in_server import StandInHandler, start_server
+
+# --- 測試參數 ---
+NUM_TEXTS = int(os.environ.get("NUM_TEXTS", 2000))
+BATCH_SIZES = [16, 64, 256]
+UPSERT_BATCH_SIZE = 256
+
+
+def timed(label, fn, texts):
+    StandInHandler.request_count = 0
+    start = time.perf_counter()
+    vectors = fn(texts)
+    elapsed = time.perf_counter() - start
+    assert len(vectors) == len(texts)
+    print(f"{label:<28} | {elapsed:>8.2f} 秒 | {StandInHandler.request_count:>6} 次請求 | {len(texts) / elapsed:>9.1f} 筆/秒")
+    return elapsed
+
+
+if __name__ == "__main__":
+    server, base_url = start_server()
+    texts = [f"第 {i} 筆測試文本：向量資料庫很強大" for i in range(NUM_TEXTS)]
+    print(f"📡 替身伺服器: {base_url} (每請求延遲 {StandInHandler.request_latency * 1000:.0f} ms)")
+    print(f"📦 文本數: {NUM_TEXTS}\n")
+    print(f"{'模式':<28} | {'耗時':>10} | {'請求數':>9} | {'吞吐量':>12}")
+    print("-" * 72)
+
+    with requests.Session() as session:
+        baseline = timed("逐筆 /api/embeddings", lambda t: embed_one_by_one(t, base_url=base_url, session=session), texts)
+        for bs in BATCH_SIZES:
+            elapsed = timed(
+                f"批次 /api/embed (bs={bs})",
+                lambda t: embed_batched(t, base_url=base_url, batch_size=bs, session=session),
+                texts,
+            )
+            print(f"{'':<28}   ↳ 加速 {baseline / elapsed:.1f}x")
+
+    upsert_calls = -(-NUM_TEXTS // UPSERT_BATCH_SIZE)
+    print(f"\n🗂️ Qdrant upsert 呼叫次數: 逐筆 {NUM_TEXTS} 次 → 批量 {upsert_calls} 次 (每批 {UPSERT_BATCH_SIZE} 點)")
+    server.shutdown()
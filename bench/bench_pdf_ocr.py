@@ -0,0 +1,29 @@
+"""
+頁面平行 OCR 的擴展性測試：同一份 PDF 以不同 worker 數處理，比較耗時與加速比。
+
+    python bench/bench_pdf_ocr.py HW/day7/1.pdf
+"""
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from common.pdf_extract import PageOCRPool
+
+if __name__ == "__main__":
+    pdf_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(__file__), "..", "HW", "day7", "1.pdf")
+    max_workers = os.cpu_count() or 1
+    worker_counts = sorted({1, 2, 4, 8, max_workers} & set(range(1, max_workers + 1)))
+
+    print(f"📄 {pdf_path}")
+    print(f"{'workers':>8} | {'耗時(s)':>8} | {'頁/秒':>8} | {'加速比':>6}")
+    print("-" * 42)
+    baseline = None
+    for workers in worker_counts:
+        with PageOCRPool(workers=workers) as pool:
+            pool.warm_up()  # 計時前讓每個 worker 都啟動並載入模型
+            start = time.perf_counter()
+            pages = pool.ocr_pdf(pdf_path)
+            elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"{workers:>8} | {elapsed:>8.2f} | {len(pages) / elapsed:>8.2f} | {baseline / elapsed:>5.1f}x")
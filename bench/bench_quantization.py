@@ -0,0 +1,196 @@
+"""
+比較向量量化方式 (none / int8 / binary) 的常駐記憶體、查詢延遲與 recall@k (以 float32 精確搜尋為基準)。
+- 向量來源：day5 data_0X.txt 切塊後在 Embedding 快取中已有的向量 (跑過 day5 即可)；
+  快取不足時改用合成的 4096 維分群向量
+- 預設在本地以 NumPy 模擬量化搜尋 (量化分數取 limit × oversampling 個候選，再以原始向量 rescore)，
+  int8 含與 Qdrant 相同的偏移/縮放修正項，binary 以 popcount 算漢明距離；
+  NumPy 沒有 int8 矩陣乘法，本地 int8 延遲約與 float32 相同，只供參考 recall 與記憶體
+- 加上 --qdrant 時改為實際建立 Qdrant collection 並以 search_params 查詢
+
+    python bench/bench_quantization.py
+    python bench/bench_quantization.py --qdrant http://localhost:6333 --k 10
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from common.quantization import QUANTIZATION_KINDS, DEFAULT_OVERSAMPLING, bytes_per_vector
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "HW", "day5")
+EMBED_API_URL = "https://ws-04.wade0426.me/embed"
+EMBED_TASK = "檢索技術文件"
+
+
+def load_cached_vectors():
+    """day5 三種切塊方式的 chunk 向量 (只取快取中已有的)"""
+    from common.chunking import METHODS, iter_file_chunks
+    from common.embed_cache import get_default_cache, make_key
+
+    texts = []
+    for method in METHODS:
+        for i in range(1, 6):
+            path = os.path.join(DATA_DIR, f"data_{i:02d}.txt")
+            if os.path.exists(path):
+                texts.extend(c.text for c in iter_file_chunks(path, method))
+    keys = [make_key(EMBED_API_URL, t, EMBED_TASK, True) for t in dict.fromkeys(texts)]
+    found = get_default_cache().get_many(keys)
+    return np.array(list(found.values()), dtype=np.float32) if found else None
+
+
+def synthetic_vectors(n=20000, dim=4096, clusters=64, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, n)] + 0.6 * rng.normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def split_queries(vectors, num_queries, seed=1):
+    """以加上雜訊的語料向量當查詢 (語料本身保持完整)"""
+    rng = np.random.default_rng(seed)
+    queries = vectors[rng.choice(len(vectors), num_queries, replace=False)]
+    queries = queries + 0.05 * rng.normal(size=queries.shape).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def top_k(scores, k):
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1)
+    return np.take_along_axis(part, order, axis=1)
+
+
+# 每個 uint16 的 1 位元數 (popcount 查表；NumPy 2 起改用內建的 np.bitwise_count)
+POPCOUNT = np.array([bin(i).count("1") for i in range(1 << 16)], dtype=np.uint8)
+
+
+def popcount(words):
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words)
+    return POPCOUNT[words.view(np.uint16)]
+
+
+def pack_bits(vectors):
+    """正負號打包成 uint64 字組 (維度不足 64 的倍數時補 0)"""
+    bits = np.packbits(vectors > 0, axis=1)
+    pad = -bits.shape[1] % 8
+    if pad:
+        bits = np.pad(bits, ((0, 0), (0, pad)))
+    return np.ascontiguousarray(bits).view(np.uint64)
+
+
+class LocalQuantized:
+    """以 NumPy 模擬 Qdrant 的量化搜尋 + rescore (編碼與修正項在建立時算好，查詢時只做打分)"""
+
+    def __init__(self, vectors, kind, quantile=0.99):
+        self.vectors = vectors
+        self.kind = kind
+        if kind == "int8":
+            lo, hi = np.quantile(vectors, [1 - quantile, quantile])
+            self.scale = float(hi - lo) / 255.0
+            # x ≈ scale * code + shift，code 為 int8 (-128..127)
+            self.shift = float(lo) + 128 * self.scale
+            codes = np.clip(np.round((vectors - lo) / self.scale), 0, 255) - 128
+            self.codes = codes.astype(np.float32)  # 只轉一次；int8 值在 float32 中可精確表示
+            self.code_sums = self.codes.sum(axis=1)
+        elif kind == "binary":
+            self.codes = pack_bits(vectors)
+
+    def _quantized_scores(self, queries):
+        if self.kind == "int8":
+            q_codes = np.clip(np.round((queries - self.shift + 128 * self.scale) / self.scale), 0, 255) - 128
+            q_codes = q_codes.astype(np.float32)
+            # 展開 (scale*q + shift)·(scale*x + shift)：各向量的偏移修正項與 Qdrant 一樣預先算好
+            dot = q_codes @ self.codes.T
+            correction = self.scale * self.shift * (q_codes.sum(axis=1, keepdims=True) + self.code_sums)
+            return self.scale ** 2 * dot + correction + self.codes.shape[1] * self.shift ** 2
+        # 漢明距離越小越相似
+        return -np.stack([popcount(np.bitwise_xor(self.codes, b)).sum(axis=1, dtype=np.int32)
+                          for b in pack_bits(queries)]).astype(np.float32)
+
+    def search(self, queries, k, oversampling):
+        if self.kind == "none":
+            return top_k(queries @ self.vectors.T, k)
+        candidates = top_k(self._quantized_scores(queries), min(len(self.vectors), int(k * oversampling)))
+        rescored = np.einsum("qd,qcd->qc", queries, self.vectors[candidates])
+        return np.take_along_axis(candidates, top_k(rescored, k), axis=1)
+
+
+def recall_at_k(found, exact):
+    return float(np.mean([len(set(f) & set(e)) / len(e) for f, e in zip(found, exact)]))
+
+
+def bench_local(vectors, queries, k, oversampling):
+    exact = top_k(queries @ vectors.T, k)
+    rows = []
+    for kind in QUANTIZATION_KINDS:
+        index = LocalQuantized(vectors, kind)
+        ratio = oversampling or DEFAULT_OVERSAMPLING[kind] or 1.0
+        index.search(queries[:1], k, ratio)  # 暖機
+        start = time.perf_counter()
+        found = [index.search(q[None], k, ratio)[0] for q in queries]
+        latency = (time.perf_counter() - start) / len(queries) * 1000
+        rows.append((kind, ratio, latency, recall_at_k(found, exact)))
+    return rows
+
+
+def bench_qdrant(url, vectors, queries, k, oversampling):
+    from qdrant_client import QdrantClient, models
+    from common.quantization import quantization_config, search_params, vector_params
+
+    client = QdrantClient(url=url)
+    exact = top_k(queries @ vectors.T, k)
+    rows = []
+    for kind in QUANTIZATION_KINDS:
+        name = f"bench_quantization_{kind}"
+        if client.collection_exists(name):
+            client.delete_collection(name)
+        client.create_collection(name, vectors_config=vector_params(vectors.shape[1], models.Distance.COSINE, kind),
+                                 quantization_config=quantization_config(kind))
+        client.upload_collection(name, vectors=vectors, ids=range(len(vectors)), batch_size=256, wait=True)
+        params = search_params(kind, oversampling=oversampling)
+        found = []
+        start = time.perf_counter()
+        for q in queries:
+            points = client.query_points(name, query=q.tolist(), limit=k, search_params=params).points
+            found.append([p.id for p in points])
+        latency = (time.perf_counter() - start) / len(queries) * 1000
+        ratio = params.quantization.oversampling if params and params.quantization else 1.0
+        rows.append((kind, ratio, latency, recall_at_k(found, exact)))
+        client.delete_collection(name)
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="向量量化的記憶體 / 延遲 / recall 比較")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--oversampling", type=float, help="預設 int8 為 2、binary 為 3")
+    parser.add_argument("--qdrant", help="Qdrant URL；未指定時以 NumPy 在本地模擬")
+    parser.add_argument("--synthetic", action="store_true", help="不使用快取向量，直接用合成資料")
+    args = parser.parse_args()
+
+    vectors = None if args.synthetic else load_cached_vectors()
+    if vectors is None or len(vectors) < args.k * 20:
+        if not args.synthetic:
+            print("ℹ️ 快取中的 day5 向量不足，改用合成的 4096 維向量")
+        vectors = synthetic_vectors()
+    else:
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = split_queries(vectors, min(args.queries, len(vectors)))
+    dim = vectors.shape[1]
+    print(f"📦 語料 {len(vectors)} 筆 × {dim} 維，查詢 {len(queries)} 筆，recall@{args.k}")
+
+    if args.qdrant:
+        rows = bench_qdrant(args.qdrant, vectors, queries, args.k, args.oversampling)
+    else:
+        rows = bench_local(vectors, queries, args.k, args.oversampling)
+
+    print(f"\n{'量化':<8} | {'RAM/百萬筆':>11} | {'磁碟/百萬筆':>11} | {'oversampling':>12} | {'延遲(ms)':>9} | {'recall':>7}")
+    print("-" * 75)
+    for kind, ratio, latency, recall in rows:
+        ram_gb = bytes_per_vector(dim, kind) * 1e6 / 1024 ** 3
+        disk_gb = 0.0 if kind == "none" else bytes_per_vector(dim, "none") * 1e6 / 1024 ** 3
+        print(f"{kind:<8} | {ram_gb:>9.2f}GB | {disk_gb:>9.2f}GB | {ratio:>12.1f} | {latency:>9.3f} | {recall:>7.3f}")
@@ -0,0 +1,47 @@
+"""
+逐頁 VLM 轉換的併發與續傳測試 (本地替身 chat/completions 伺服器，每頁固定延遲並隨機回傳 524)。
+
+    python bench/bench_vlm_pages.py CW/sample_table.pdf
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from common.vlm_pages import convert_pages, page_count
+from bench.stand_in_server import StandInHandler, start_server
+
+PROMPT = "Convert this page to Markdown. Focus on table accuracy."
+PARAMS = {"model": "stand-in-vlm", "max_tokens": 4096, "temperature": 0.0}
+
+if __name__ == "__main__":
+    pdf_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(__file__), "..", "CW", "example.pdf")
+    StandInHandler.chat_latency = 0.5
+    StandInHandler.chat_fail_rate = 0.1
+    server, base_url = start_server()
+    url = f"{base_url}/v1/chat/completions"
+    pages = page_count(pdf_path)
+    print(f"📄 {pdf_path}：{pages} 頁，替身伺服器每頁 {StandInHandler.chat_latency}s，524 機率 {StandInHandler.chat_fail_rate:.0%}\n")
+
+    for concurrency in (1, 4, 8):
+        checkpoint_dir = tempfile.mkdtemp(prefix="vlm_ckpt_")
+        start = time.perf_counter()
+        convert_pages(pdf_path, url, PARAMS, PROMPT, checkpoint_dir, concurrency=concurrency, base_delay=0.1)
+        elapsed = time.perf_counter() - start
+        ideal = StandInHandler.chat_latency * -(-pages // concurrency)
+        print(f"🔁 併發 {concurrency}: {elapsed:.2f} 秒 (理想值約 {ideal:.2f} 秒)\n")
+        shutil.rmtree(checkpoint_dir)
+
+    # 續傳：先刪掉一半的頁面 checkpoint，再跑一次只會補轉那些頁
+    checkpoint_dir = tempfile.mkdtemp(prefix="vlm_ckpt_")
+    convert_pages(pdf_path, url, PARAMS, PROMPT, checkpoint_dir, concurrency=4, base_delay=0.1)
+    for name in sorted(os.listdir(checkpoint_dir))[: pages // 2]:
+        if name.startswith("page_"):
+            os.remove(os.path.join(checkpoint_dir, name))
+    StandInHandler.request_count = 0
+    convert_pages(pdf_path, url, PARAMS, PROMPT, checkpoint_dir, concurrency=4, base_delay=0.1)
+    print(f"♻️ 續傳只送出 {StandInHandler.request_count} 次請求 (含重試)")
+    shutil.rmtree(checkpoint_dir)
+    server.shutdown()
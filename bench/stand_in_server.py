@@ -0,0 +1,76 @@
+"""本地替身伺服器：模擬遠端 API 的延遲與回應格式，讓效能比較不依賴外部服務。"""
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def fake_vector(text, dim=16):
+    """依文本產生固定的假向量 (同一段文本永遠得到同一個向量)"""
+    seed = zlib.crc32(text.encode("utf-8"))
+    return [((seed >> (i % 24)) % 1000) / 1000.0 for i in range(dim)]
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """每個請求固定延遲 request_latency 秒，每段文本另加 per_item_latency 秒"""
+    request_latency = 0.02
+    per_item_latency = 0.0005
+    dim = 16
+    chat_latency = 0.5        # chat/completions 每次回應的延遲
+    chat_fail_rate = 0.0      # 以此機率回傳 Cloudflare 524
+    request_count = 0
+    _count_lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, data, status=200):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _count(self):
+        with StandInHandler._count_lock:
+            StandInHandler.request_count += 1
+
+    def do_POST(self):
+        self._count()
+        data = self._read_json()
+        if self.path == "/api/embeddings":  # Ollama 舊版，逐筆
+            time.sleep(self.request_latency + self.per_item_latency)
+            self._send_json({"embedding": fake_vector(data["prompt"], self.dim)})
+        elif self.path == "/api/embed":  # Ollama 多輸入版
+            texts = data["input"] if isinstance(data["input"], list) else [data["input"]]
+            time.sleep(self.request_latency + self.per_item_latency * len(texts))
+            self._send_json({"embeddings": [fake_vector(t, self.dim) for t in texts]})
+        elif self.path == "/embed":  # 課程使用的遠端 /embed API
+            texts = data["texts"]
+            time.sleep(self.request_latency + self.per_item_latency * len(texts))
+            self._send_json({"embeddings": [fake_vector(t, self.dim) for t in texts]})
+        elif self.path == "/v1/chat/completions":  # OpenAI 相容的 VLM 端點
+            time.sleep(self.chat_latency)
+            if random.random() < self.chat_fail_rate:
+                return self._send_json({"error": "A timeout occurred"}, status=524)
+            content = data["messages"][-1]["content"]
+            images = sum(1 for part in content if isinstance(part, dict) and part.get("type") == "image_url")
+            markdown = f"```markdown\n| 欄位 | 值 |\n|---|---|\n| 圖片數 | {images} |\n```"
+            self._send_json({"choices": [{"message": {"role": "assistant", "content": markdown}}]})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+
+def start_server(handler_cls=StandInHandler, port=0):
+    """在背景執行緒啟動伺服器，回傳 (server, base_url)"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler_cls)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
@@ -0,0 +1,5 @@
+"""各課堂 / 作業腳本共用的工具模組 (Embedding 快取、切塊、向量庫輔助等)。"""
+import os
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(REPO_ROOT, ".cache")
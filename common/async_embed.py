@@ -0,0 +1,66 @@
+import asyncio
+import random
+
+import httpx
+
+# --- 基本設定 ---
+RETRY_STATUS = {429, 500, 502, 503, 504, 520, 522, 524}
+
+
+async def _post_batch(client, url, batch, extra, sem, index, retries, base_delay, max_delay):
+    """送出單一批次；失敗時以 full-jitter 指數退避重試，最終失敗回傳 None"""
+    payload = {"texts": batch, **extra}
+    async with sem:
+        for attempt in range(retries):
+            try:
+                response = await client.post(url, json=payload)
+                if response.status_code == 200:
+                    embeddings = response.json()["embeddings"]
+                    if len(embeddings) == len(batch):
+                        return embeddings
+                    print(f"⚠️ 批次 {index} 回傳 {len(embeddings)} 筆，預期 {len(batch)} 筆")
+                elif response.status_code not in RETRY_STATUS:
+                    print(f"❌ 批次 {index} 狀態碼 {response.status_code}，不重試")
+                    return None
+                else:
+                    print(f"⚠️ 批次 {index} 狀態碼 {response.status_code}，第 {attempt + 1} 次重試...")
+            except (httpx.HTTPError, ValueError, KeyError) as e:
+                print(f"⚠️ 批次 {index} 第 {attempt + 1} 次失敗: {e}")
+            if attempt + 1 < retries:
+                await asyncio.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** attempt)))
+    return None
+
+
+async def embed_async(texts, url, batch_size=10, concurrency=4, retries=5, timeout=60,
+                      task_description=None, normalize=True, base_delay=1.0, max_delay=20.0):
+    """
+    以 asyncio 讓最多 concurrency 個批次同時在路上 (共用一個連線池)。
+    回傳與 texts 等長、順序一致的清單，失敗批次的位置為 None (明確的缺口，不會縮短清單)。
+    """
+    extra = {"normalize": normalize}
+    if task_description:
+        extra["task_description"] = task_description
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    sem = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+        results = await asyncio.gather(*[
+            _post_batch(client, url, batch, extra, sem, i, retries, base_delay, max_delay)
+            for i, batch in enumerate(batches)
+        ])
+
+    embeddings = []
+    for batch, result in zip(batches, results):
+        embeddings.extend(result if result is not None else [None] * len(batch))
+    failed = sum(1 for r in results if r is None)
+    if failed:
+        print(f"!!! {failed}/{len(batches)} 個批次最終失敗，對應位置以 None 佔位 !!!")
+    return embeddings
+
+
+def embed_concurrently(texts, url, **kwargs):
+    """同步腳本用的入口 (內部以 asyncio.run 執行)"""
+    if not texts:
+        return []
+    return asyncio.run(embed_async(list(texts), url, **kwargs))
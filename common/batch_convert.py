@@ -0,0 +1,92 @@
+"""
+批次文件轉換：整個程序只建立一次 DocumentConverter (版面/表格模型只載入一次)，
+以 convert_all 串流處理目錄或 glob 中的所有文件，每份完成就立刻寫出 Markdown，失敗逐檔回報。
+
+    python -m common.batch_convert "CW/*.pdf" -o CW/converted
+    python -m common.batch_convert CW/ -o CW/converted --skip-existing
+"""
+import os
+import glob
+import json
+import time
+import argparse
+
+SUPPORTED_EXTS = (".pdf", ".docx", ".pptx", ".html", ".png", ".jpg", ".jpeg")
+
+
+def expand_inputs(patterns, exts=SUPPORTED_EXTS):
+    """目錄展開為其中支援的檔案，其他字串視為 glob；回傳排序後、去重的路徑清單"""
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            candidates = glob.glob(os.path.join(pattern, "*"))
+        else:
+            candidates = glob.glob(pattern, recursive=True)
+        paths.extend(p for p in candidates if os.path.isfile(p) and p.lower().endswith(exts))
+    return sorted(dict.fromkeys(os.path.abspath(p) for p in paths))
+
+
+def output_path_for(path, output_dir):
+    return os.path.join(output_dir, os.path.splitext(os.path.basename(path))[0] + ".md")
+
+
+def convert_batch(doc_converter, paths, output_dir, skip_existing=False):
+    """
+    以同一個 (已暖機的) DocumentConverter 處理所有文件。
+    回傳每份文件的結果 [{"file", "status", "output", "seconds", "errors"}]，並寫出 _report.json。
+    """
+    from docling.datamodel.base_models import ConversionStatus
+
+    os.makedirs(output_dir, exist_ok=True)
+    if skip_existing:
+        skipped = [p for p in paths if os.path.exists(output_path_for(p, output_dir))]
+        paths = [p for p in paths if p not in skipped]
+        if skipped:
+            print(f"⏭️ 略過已有輸出的 {len(skipped)} 份文件")
+
+    report = []
+    start = last = time.perf_counter()
+    print(f"🚀 開始批次轉換 {len(paths)} 份文件 → {output_dir}")
+    for result in doc_converter.convert_all(paths, raises_on_error=False):
+        now = time.perf_counter()
+        source = str(result.input.file)
+        entry = {"file": source, "status": result.status.name, "output": None,
+                 "seconds": round(now - last, 3), "errors": [e.error_message for e in result.errors]}
+        last = now
+        if result.status in (ConversionStatus.SUCCESS, ConversionStatus.PARTIAL_SUCCESS):
+            entry["output"] = output_path_for(source, output_dir)
+            with open(entry["output"], "w", encoding="utf-8") as f:
+                f.write(result.document.export_to_markdown())
+            mark = "✅" if result.status == ConversionStatus.SUCCESS else "⚠️"
+            print(f"{mark} [{len(report) + 1}/{len(paths)}] {os.path.basename(source)} ({entry['seconds']:.1f}s)")
+        else:
+            print(f"❌ [{len(report) + 1}/{len(paths)}] {os.path.basename(source)}: "
+                  f"{result.status.name} {'; '.join(entry['errors'])}")
+        report.append(entry)
+
+    elapsed = time.perf_counter() - start
+    ok = sum(1 for r in report if r["output"])
+    print(f"\n🏁 完成 {ok}/{len(report)} 份，失敗 {len(report) - ok} 份，總耗時 {elapsed:.1f} 秒")
+    with open(os.path.join(output_dir, "_report.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="以單一暖機的 DocumentConverter 批次轉換文件")
+    parser.add_argument("inputs", nargs="+", help="檔案、目錄或 glob (例如 \"CW/*.pdf\")")
+    parser.add_argument("-o", "--output-dir", default="converted")
+    parser.add_argument("--skip-existing", action="store_true", help="已有輸出的文件不再轉換 (可用於續跑)")
+    args = parser.parse_args()
+
+    from docling.datamodel.base_models import InputFormat
+    from docling.document_converter import DocumentConverter
+
+    inputs = expand_inputs(args.inputs)
+    if not inputs:
+        raise SystemExit("❌ 找不到任何可轉換的文件")
+    load_start = time.perf_counter()
+    converter = DocumentConverter()
+    converter.initialize_pipeline(InputFormat.PDF)  # 先載入模型，計時不混入第一份文件
+    print(f"🔥 轉換器暖機完成 ({time.perf_counter() - load_start:.1f}s)")
+    convert_batch(converter, inputs, args.output_dir, skip_existing=args.skip_existing)
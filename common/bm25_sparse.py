@@ -0,0 +1,76 @@
+"""
+本地 BM25 稀疏向量編碼器 (不需網路、不需模型下載)。
+- 中文以字元 bigram 切詞 (單字詞保留 unigram)，英數字以單字切詞並轉小寫
+- token id 由穩定雜湊取得，不必維護詞彙表檔案；已算過的 token 會快取
+- 文件端只放 BM25 的詞頻權重，IDF 交給 Qdrant 的 Modifier.IDF 在伺服器端計算；
+  查詢端每個 token 權重為 1，與 fastembed 的 Qdrant/bm25 作法相同
+
+    encoder = BM25SparseEncoder()
+    models.Prefetch(query=encoder.query_vector("停水怎麼查詢"), using="sparse", limit=5)
+"""
+import re
+import zlib
+from collections import Counter
+from functools import lru_cache
+
+CJK_CHARS = "\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"
+TOKEN_RE = re.compile(f"[a-z0-9]+|[{CJK_CHARS}]+")
+CJK_RE = re.compile(f"[{CJK_CHARS}]")
+STOPWORDS = {"a", "an", "and", "are", "is", "of", "or", "the", "to", "in", "on", "for"}
+
+
+def tokenize(text):
+    tokens = []
+    for run in TOKEN_RE.findall(text.lower()):
+        if not CJK_RE.match(run):
+            if run not in STOPWORDS:
+                tokens.append(run)
+        elif len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+@lru_cache(maxsize=200_000)
+def token_id(token):
+    return zlib.crc32(token.encode("utf-8")) & 0x7FFFFFFF
+
+
+class BM25SparseEncoder:
+    name = "bm25-cjk-bigram"
+
+    def __init__(self, k1=1.2, b=0.75, avg_len=256):
+        self.k1 = k1
+        self.b = b
+        self.avg_len = avg_len
+
+    def config(self):
+        """影響文件端權重的設定；放進 manifest，設定改變時會觸發重建"""
+        return f"{self.name}:k1={self.k1},b={self.b},avg_len={self.avg_len}"
+
+    def encode_document(self, text):
+        """回傳 (indices, values)；values 為 BM25 詞頻部分 tf·(k1+1) / (tf + k1·(1-b+b·len/avg_len))"""
+        tokens = tokenize(text)
+        norm = self.k1 * (1 - self.b + self.b * len(tokens) / self.avg_len)
+        weights = Counter()
+        for token, tf in Counter(tokens).items():
+            # 雜湊碰撞的 token 權重相加，確保 indices 不重複
+            weights[token_id(token)] += tf * (self.k1 + 1) / (tf + norm)
+        return list(weights), list(weights.values())
+
+    def encode_query(self, text):
+        indices = list(dict.fromkeys(token_id(t) for t in tokenize(text)))
+        return indices, [1.0] * len(indices)
+
+    def document_vector(self, text):
+        from qdrant_client import models
+
+        indices, values = self.encode_document(text)
+        return models.SparseVector(indices=indices, values=values)
+
+    def query_vector(self, text):
+        from qdrant_client import models
+
+        indices, values = self.encode_query(text)
+        return models.SparseVector(indices=indices, values=values)
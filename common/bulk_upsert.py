@@ -0,0 +1,84 @@
+"""
+串流式批量上傳：輸入 (id, vector, payload) 的 iterator，依「筆數」與「估計位元組」兩個上限切批，
+由多個 worker 平行 upsert；同時在路上的批次有上限 (backpressure)，
+因此記憶體峰值只跟 max_inflight × 批次大小有關，與語料總量無關。
+"""
+import json
+import time
+import threading
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+
+from qdrant_client import models
+
+# JSON 傳輸時每個浮點數大約佔用的位元組 (例如 "-0.012345678,")
+BYTES_PER_FLOAT = 20
+
+
+def batched(iterable, n):
+    """把 iterable 切成每組 n 筆的 list (最後一組可能較少)"""
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, n))
+        if not chunk:
+            return
+        yield chunk
+
+
+def estimate_point_bytes(vector, payload):
+    if isinstance(vector, dict):  # named vectors
+        dims = sum(len(v) if isinstance(v, list) else 64 for v in vector.values())
+    else:
+        dims = len(vector)
+    return dims * BYTES_PER_FLOAT + len(json.dumps(payload, ensure_ascii=False).encode("utf-8")) + 64
+
+
+def iter_batches(items, batch_size, max_batch_bytes):
+    batch, size = [], 0
+    for point_id, vector, payload in items:
+        point_bytes = estimate_point_bytes(vector, payload)
+        if batch and (len(batch) >= batch_size or size + point_bytes > max_batch_bytes):
+            yield batch
+            batch, size = [], 0
+        batch.append(models.PointStruct(id=point_id, vector=vector, payload=payload))
+        size += point_bytes
+    if batch:
+        yield batch
+
+
+def stream_upsert(client, collection_name, items, batch_size=256, max_batch_bytes=8 * 1024 * 1024,
+                  workers=4, max_inflight=None, wait=True, verbose=True):
+    """平行上傳並回傳 {"points", "batches", "seconds", "points_per_sec"}；任一批次失敗時拋出例外"""
+    max_inflight = max_inflight or workers * 2
+    slots = threading.BoundedSemaphore(max_inflight)
+    lock = threading.Lock()
+    errors = []
+    stats = {"points": 0, "batches": 0}
+
+    def upload(batch):
+        try:
+            client.upsert(collection_name=collection_name, points=batch, wait=wait)
+            with lock:
+                stats["points"] += len(batch)
+                stats["batches"] += 1
+        except Exception as e:
+            errors.append(e)
+        finally:
+            slots.release()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upsert") as pool:
+        for batch in iter_batches(items, batch_size, max_batch_bytes):
+            if errors:
+                break
+            slots.acquire()  # 在路上的批次已滿時，暫停讀取上游 (backpressure)
+            pool.submit(upload, batch)
+    if errors:
+        raise errors[0]
+
+    stats["seconds"] = time.perf_counter() - start
+    stats["points_per_sec"] = stats["points"] / stats["seconds"] if stats["seconds"] > 0 else 0.0
+    if verbose:
+        print(f"   ⬆️ [{collection_name}] 上傳 {stats['points']} 點 / {stats['batches']} 批，"
+              f"{stats['points_per_sec']:.0f} 點/秒")
+    return stats
@@ -0,0 +1,145 @@
+"""
+本地 append-only chunk 文字庫：Qdrant 只存 id (with_payload=False)，文字從這裡以 mmap 切片取回。
+- chunks.dat：所有文字依序附加 (UTF-8)
+- chunks.idx：每行一筆 JSON {"id", "offset", "length", "meta"}，後寫入的覆蓋先前的；length 為 -1 代表刪除
+- 開啟時讀入 offset 索引，讀取時直接從 mmap 切片 (get_bytes 為零複製的 memoryview)
+存放位置與倒排索引相同：.cache/stores/<name>/
+
+    store = ChunkStore.open("gemma_multi_turn_rag")
+    store.put(point_id, text, source="data_01.txt")
+    store.flush()
+    store.record(point_id)   # {"text": ..., "source": "data_01.txt"}
+"""
+import os
+import json
+import mmap
+
+from common.inverted_index import STORE_DIR, store_path
+
+
+class ChunkStore:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._data_path = os.path.join(path, "chunks.dat")
+        self._index_path = os.path.join(path, "chunks.idx")
+        self._entries = {}   # id -> (offset, length, meta)
+        self._records = 0    # 索引檔總行數 (含已被覆蓋的)，用來判斷何時該壓縮
+        if os.path.exists(self._index_path):
+            with open(self._index_path, encoding="utf-8") as f:
+                for line in f:
+                    self._apply(json.loads(line))
+        self._data = open(self._data_path, "ab")
+        self._index = open(self._index_path, "a", encoding="utf-8")
+        self._mmap = None
+        self._mapped_size = 0
+
+    @classmethod
+    def open(cls, name, directory=STORE_DIR):
+        return cls(store_path(name, directory))
+
+    def _apply(self, record):
+        self._records += 1
+        if record["length"] < 0:
+            self._entries.pop(record["id"], None)
+        else:
+            self._entries[record["id"]] = (record["offset"], record["length"], record.get("meta") or {})
+
+    def _append_index(self, record):
+        self._index.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._apply(record)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, chunk_id):
+        return chunk_id in self._entries
+
+    def ids(self):
+        return list(self._entries)
+
+    def put(self, chunk_id, text, **meta):
+        data = text.encode("utf-8")
+        offset = self._data.tell()
+        self._data.write(data)
+        self._append_index({"id": chunk_id, "offset": offset, "length": len(data), "meta": meta})
+
+    def update_meta(self, chunk_id, **meta):
+        """只更新中繼資料 (例如來源清單)，文字沿用原本的位置"""
+        offset, length, old = self._entries[chunk_id]
+        self._append_index({"id": chunk_id, "offset": offset, "length": length, "meta": {**old, **meta}})
+
+    def delete(self, chunk_id):
+        if chunk_id in self._entries:
+            self._append_index({"id": chunk_id, "offset": 0, "length": -1})
+
+    def flush(self):
+        self._data.flush()
+        self._index.flush()
+
+    def _view(self):
+        size = self._data.tell()
+        if size != self._mapped_size:
+            self._data.flush()
+            # 舊的 mmap 可能還有呼叫端持有的切片，不主動 close，交給參照計數回收
+            self._mmap = None
+            if size:
+                with open(self._data_path, "rb") as f:
+                    self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mapped_size = size
+        return memoryview(self._mmap) if self._mmap is not None else memoryview(b"")
+
+    def get_bytes(self, chunk_id):
+        """零複製：回傳 mmap 上的 memoryview 切片 (呼叫端用完即丟，不要長期持有)"""
+        offset, length, _ = self._entries[chunk_id]
+        return self._view()[offset:offset + length]
+
+    def get(self, chunk_id, default=None):
+        if chunk_id not in self._entries:
+            return default
+        return str(self.get_bytes(chunk_id), "utf-8")
+
+    def meta(self, chunk_id):
+        return self._entries[chunk_id][2]
+
+    def record(self, chunk_id):
+        """{"text": 文字, **meta}；不存在時回傳 None"""
+        if chunk_id not in self._entries:
+            return None
+        return {"text": self.get(chunk_id), **self.meta(chunk_id)}
+
+    def records(self, chunk_ids):
+        return [r for r in (self.record(i) for i in chunk_ids) if r is not None]
+
+    def clear(self):
+        self.close()
+        for file_path in (self._data_path, self._index_path):
+            if os.path.exists(file_path):
+                os.remove(file_path)
+        self.__init__(self.path)
+
+    def compact(self, min_garbage_ratio=0.5):
+        """被覆蓋/刪除的紀錄過多時，把現存 chunk 重寫到新檔後再替換"""
+        if self._records <= len(self._entries) / (1 - min_garbage_ratio):
+            return False
+        self.flush()
+        offset = 0
+        with open(self._data_path + ".tmp", "wb") as data, \
+                open(self._index_path + ".tmp", "w", encoding="utf-8") as index:
+            for chunk_id, (_, _, meta) in self._entries.items():
+                chunk = self.get_bytes(chunk_id)
+                data.write(chunk)
+                index.write(json.dumps({"id": chunk_id, "offset": offset, "length": len(chunk), "meta": meta},
+                                       ensure_ascii=False) + "\n")
+                offset += len(chunk)
+        self.close()
+        os.replace(self._data_path + ".tmp", self._data_path)
+        os.replace(self._index_path + ".tmp", self._index_path)
+        self.__init__(self.path)
+        return True
+
+    def close(self):
+        self._mmap = None
+        self._mapped_size = 0
+        self._data.close()
+        self._index.close()
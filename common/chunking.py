@@ -0,0 +1,136 @@
+"""
+串流式切塊引擎：逐塊讀檔 (大檔使用 mmap)，以 generator 產出帶有原文位置的 chunk。
+三種策略 (固定大小 / 滑動視窗 / 語意切塊) 皆為 O(n) 時間，記憶體只與讀取區塊大小有關，
+切出的結果與 HW/day5 原本 get_chunks 的全文切法完全相同。
+"""
+import io
+import os
+import re
+import mmap
+import codecs
+from collections import namedtuple
+
+# --- 基本設定 ---
+BLOCK_CHARS = 1 << 16                 # 每次讀取的字元數
+MMAP_THRESHOLD = 64 * 1024 * 1024     # 超過此大小的檔案改用 mmap 讀取
+MAX_PENDING_CHARS = 1 << 20           # 語意切塊時，單句超過此長度就強制切斷，避免無標點長文撐爆記憶體
+SENTENCE_END = re.compile(r"[。？！\n]")
+
+# start / end 為 chunk 在來源全文中的字元位置 (含頭不含尾)
+Chunk = namedtuple("Chunk", ["text", "start", "end", "source"])
+
+METHODS = {
+    "固定大小_500": {"kind": "fixed", "size": 500},
+    "滑動視窗_400_100": {"kind": "sliding", "size": 400, "overlap": 100},
+    "語意切塊_進階": {"kind": "semantic", "max_len": 550},
+}
+
+
+# --- 讀檔 ---
+
+def iter_text_blocks(path, encoding="utf-8-sig", block_chars=BLOCK_CHARS):
+    """逐塊讀出文字；大檔以 mmap 搭配增量解碼，換行一律轉成 \\n (與文字模式 open 相同)"""
+    if os.path.getsize(path) < MMAP_THRESHOLD:
+        with open(path, "r", encoding=encoding) as f:
+            while True:
+                block = f.read(block_chars)
+                if not block:
+                    return
+                yield block
+
+    decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder(encoding)(), translate=True)
+    block_bytes = block_chars * 4
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for i in range(0, len(mm), block_bytes):
+            block = decoder.decode(mm[i:i + block_bytes])
+            if block:
+                yield block
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+
+
+# --- 三種切塊策略 (輸入為文字區塊的 iterable) ---
+
+def fixed_chunks(blocks, size=500):
+    buf, base = "", 0
+    for block in blocks:
+        buf += block
+        i = 0
+        while len(buf) - i >= size:
+            yield buf[i:i + size], base + i, base + i + size
+            i += size
+        buf, base = buf[i:], base + i
+    if buf:
+        yield buf, base, base + len(buf)
+
+
+def sliding_chunks(blocks, size=400, overlap=100):
+    step = size - overlap
+    buf, base = "", 0
+    for block in blocks:
+        buf += block
+        i = 0
+        # 後面確定還有文字時才輸出並前進，最後一塊留到讀完再處理
+        while len(buf) - i > size:
+            yield buf[i:i + size], base + i, base + i + size
+            i += step
+        buf, base = buf[i:], base + i
+    i = 0
+    while i < len(buf):
+        end = min(i + size, len(buf))
+        yield buf[i:end], base + i, base + end
+        if i + size >= len(buf):
+            break
+        i += step
+
+
+def _iter_sentences(blocks, max_pending=MAX_PENDING_CHARS):
+    """依 。？！換行 斷句 (句尾標點留在句子內)，回傳 (句子, 起始位置)"""
+    pending, base = "", 0
+    for block in blocks:
+        pending += block
+        i = 0
+        for m in SENTENCE_END.finditer(pending):
+            yield pending[i:m.end()], base + i
+            i = m.end()
+        pending, base = pending[i:], base + i
+        if len(pending) > max_pending:
+            yield pending, base
+            pending, base = "", base + len(pending)
+    if pending:
+        yield pending, base
+
+
+def semantic_chunks(blocks, max_len=550):
+    parts, length, start = [], 0, 0
+    for sentence, pos in _iter_sentences(blocks):
+        if length + len(sentence) <= max_len:
+            if not parts:
+                start = pos
+            parts.append(sentence)
+            length += len(sentence)
+        else:
+            if parts:
+                yield "".join(parts), start, start + length
+            parts, length, start = [sentence], len(sentence), pos
+    if parts:
+        yield "".join(parts), start, start + length
+
+
+# --- 對外介面 ---
+
+def iter_chunks(source_text, method, source=None):
+    """source_text 可以是整段字串或文字區塊的 iterable"""
+    if method not in METHODS:
+        raise ValueError(f"未知的切塊方法: {method}")
+    blocks = [source_text] if isinstance(source_text, str) else source_text
+    params = dict(METHODS[method])
+    kind = params.pop("kind")
+    splitter = {"fixed": fixed_chunks, "sliding": sliding_chunks, "semantic": semantic_chunks}[kind]
+    for text, start, end in splitter(blocks, **params):
+        yield Chunk(text, start, end, source)
+
+
+def iter_file_chunks(path, method, encoding="utf-8-sig"):
+    return iter_chunks(iter_text_blocks(path, encoding), method, source=os.path.basename(path))
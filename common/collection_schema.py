@@ -0,0 +1,212 @@
+"""
+宣告式的 Qdrant collection 設定：向量、稀疏向量、payload 索引、HNSW (m / ef_construct)、on-disk 與量化。
+apply() 會比對線上 collection 的實際設定：
+- 向量名稱 / 維度 / 距離、稀疏向量設定不同 → 必須重建 (recreate)
+- HNSW、量化、向量 on_disk 不同 → 以 update_collection 就地調整
+- payload 索引缺少或型別不同 → 補建；schema 中沒有的索引 → 刪除
+各 collection 的設定集中在 common/schemas.py。
+
+    python -m common.collection_schema plan gemma_multi_turn_rag --dim 4096
+    python -m common.collection_schema apply test_collection --dim 4096
+"""
+import argparse
+from dataclasses import dataclass, field
+from typing import Optional
+
+from qdrant_client import QdrantClient, models
+
+from common.quantization import quantization_config, resolve_kind
+
+DISTANCES = {
+    "cosine": models.Distance.COSINE,
+    "euclid": models.Distance.EUCLID,
+    "dot": models.Distance.DOT,
+    "manhattan": models.Distance.MANHATTAN,
+}
+PAYLOAD_TYPES = {
+    "keyword": models.PayloadSchemaType.KEYWORD,
+    "integer": models.PayloadSchemaType.INTEGER,
+    "float": models.PayloadSchemaType.FLOAT,
+    "bool": models.PayloadSchemaType.BOOL,
+    "text": models.PayloadSchemaType.TEXT,
+    "datetime": models.PayloadSchemaType.DATETIME,
+}
+
+
+@dataclass(frozen=True)
+class VectorSpec:
+    size: int
+    distance: str = "cosine"
+    on_disk: Optional[bool] = None  # None：有量化時原始向量放磁碟，否則放記憶體
+
+
+@dataclass(frozen=True)
+class SparseVectorSpec:
+    idf: bool = True  # 由伺服器端套用 IDF (BM25 類的稀疏向量)
+    on_disk: bool = False
+
+
+@dataclass(frozen=True)
+class HnswSpec:
+    m: int = 16
+    ef_construct: int = 100
+    on_disk: bool = False
+
+
+@dataclass
+class CollectionSchema:
+    name: str
+    vectors: dict                                         # {名稱: VectorSpec}；"" 代表未命名的預設向量
+    sparse_vectors: dict = field(default_factory=dict)    # {名稱: SparseVectorSpec}
+    payload_indexes: dict = field(default_factory=dict)   # {欄位: "keyword" / "integer" / ...}
+    hnsw: HnswSpec = field(default_factory=HnswSpec)
+    quantization: Optional[str] = None                    # none / int8 / binary；None 時依 QDRANT_QUANTIZATION
+
+    @property
+    def quantization_kind(self):
+        return resolve_kind(self.quantization)
+
+    def vector_on_disk(self, spec):
+        return spec.on_disk if spec.on_disk is not None else self.quantization_kind != "none"
+
+    def vectors_config(self):
+        params = {
+            name: models.VectorParams(size=spec.size, distance=DISTANCES[spec.distance], on_disk=self.vector_on_disk(spec))
+            for name, spec in self.vectors.items()
+        }
+        return params[""] if list(params) == [""] else params
+
+    def sparse_vectors_config(self):
+        if not self.sparse_vectors:
+            return None
+        return {
+            name: models.SparseVectorParams(
+                modifier=models.Modifier.IDF if spec.idf else None,
+                index=models.SparseIndexParams(on_disk=spec.on_disk),
+            )
+            for name, spec in self.sparse_vectors.items()
+        }
+
+    def hnsw_config(self):
+        return models.HnswConfigDiff(m=self.hnsw.m, ef_construct=self.hnsw.ef_construct, on_disk=self.hnsw.on_disk)
+
+
+def _live_vectors(info):
+    vectors = info.config.params.vectors
+    return {"": vectors} if isinstance(vectors, models.VectorParams) else dict(vectors or {})
+
+
+def _live_quantization(info):
+    config = info.config.quantization_config
+    if isinstance(config, models.ScalarQuantization):
+        return "int8"
+    if isinstance(config, models.BinaryQuantization):
+        return "binary"
+    return "none" if config is None else type(config).__name__
+
+
+def diff(schema, info):
+    """回傳 (需重建的原因, 可就地調整的變更, 要補建的索引, 要刪除的索引)"""
+    recreate, updates = [], {}
+
+    live = _live_vectors(info)
+    if set(live) != set(schema.vectors):
+        recreate.append(f"向量名稱 {sorted(live)} → {sorted(schema.vectors)}")
+    else:
+        on_disk_diff = {}
+        for name, spec in schema.vectors.items():
+            params = live[name]
+            if params.size != spec.size or params.distance != DISTANCES[spec.distance]:
+                recreate.append(f"向量 '{name}' {params.size}/{params.distance} → {spec.size}/{DISTANCES[spec.distance]}")
+            elif bool(params.on_disk) != schema.vector_on_disk(spec):
+                on_disk_diff[name] = models.VectorParamsDiff(on_disk=schema.vector_on_disk(spec))
+        if on_disk_diff:
+            updates["vectors_config"] = on_disk_diff
+
+    live_sparse = dict(info.config.params.sparse_vectors or {})
+    if set(live_sparse) != set(schema.sparse_vectors):
+        recreate.append(f"稀疏向量 {sorted(live_sparse)} → {sorted(schema.sparse_vectors)}")
+    else:
+        for name, spec in schema.sparse_vectors.items():
+            if (live_sparse[name].modifier == models.Modifier.IDF) != spec.idf:
+                recreate.append(f"稀疏向量 '{name}' IDF → {spec.idf}")
+
+    hnsw = info.config.hnsw_config
+    if (hnsw.m, hnsw.ef_construct, bool(hnsw.on_disk)) != (schema.hnsw.m, schema.hnsw.ef_construct, schema.hnsw.on_disk):
+        updates["hnsw_config"] = schema.hnsw_config()
+
+    if _live_quantization(info) != schema.quantization_kind:
+        updates["quantization_config"] = quantization_config(schema.quantization_kind) or models.Disabled.DISABLED
+
+    live_indexes = {key: value.data_type for key, value in (info.payload_schema or {}).items()}
+    wanted = {key: PAYLOAD_TYPES[kind] for key, kind in schema.payload_indexes.items()}
+    create_indexes = {key: kind for key, kind in wanted.items() if live_indexes.get(key) != kind}
+    drop_indexes = [key for key, kind in live_indexes.items() if key not in wanted or key in create_indexes]
+    return recreate, updates, create_indexes, drop_indexes
+
+
+def _create(client, schema):
+    client.create_collection(
+        collection_name=schema.name,
+        vectors_config=schema.vectors_config(),
+        sparse_vectors_config=schema.sparse_vectors_config(),
+        hnsw_config=schema.hnsw_config(),
+        quantization_config=quantization_config(schema.quantization_kind),
+    )
+    for key, kind in schema.payload_indexes.items():
+        client.create_payload_index(schema.name, field_name=key, field_schema=PAYLOAD_TYPES[kind], wait=True)
+
+
+def apply(client, schema, recreate=False, dry_run=False, verbose=True):
+    """
+    讓線上 collection 與 schema 一致；回傳 "created" / "recreated" / "updated" / "unchanged"。
+    recreate=True 時無論設定是否相同都重建 (呼叫端要全量重新匯入時使用)。
+    回傳 created / recreated 代表 collection 是空的，呼叫端需要重新匯入資料。
+    """
+    log = print if verbose else (lambda *args: None)
+    if not client.collection_exists(schema.name):
+        log(f"🧱 [{schema.name}] 建立 collection")
+        if not dry_run:
+            _create(client, schema)
+        return "created"
+
+    reasons, updates, create_indexes, drop_indexes = diff(schema, client.get_collection(schema.name))
+    if recreate or reasons:
+        log(f"🧱 [{schema.name}] 重建 collection：{'; '.join(reasons) or '指定重建'}")
+        if not dry_run:
+            client.delete_collection(schema.name)
+            _create(client, schema)
+        return "recreated"
+
+    if not (updates or create_indexes or drop_indexes):
+        log(f"✅ [{schema.name}] 設定一致，不需變更")
+        return "unchanged"
+
+    log(f"🔧 [{schema.name}] 就地調整：{', '.join(updates) or '-'}；"
+        f"補建索引 {sorted(create_indexes) or '-'}；刪除索引 {drop_indexes or '-'}")
+    if not dry_run:
+        if updates:
+            client.update_collection(collection_name=schema.name, **updates)
+        for key in drop_indexes:
+            client.delete_payload_index(schema.name, field_name=key, wait=True)
+        for key, kind in create_indexes.items():
+            client.create_payload_index(schema.name, field_name=key, field_schema=kind, wait=True)
+    return "updated"
+
+
+if __name__ == "__main__":
+    from common.schemas import SCHEMAS
+
+    parser = argparse.ArgumentParser(description="依 common/schemas.py 建立或調整 Qdrant collection")
+    parser.add_argument("command", choices=["plan", "apply"], help="plan 只列出變更，apply 實際執行")
+    parser.add_argument("names", nargs="*", help=f"collection 名稱 (預設全部：{', '.join(SCHEMAS)})")
+    parser.add_argument("--dim", type=int, required=True, help="向量維度")
+    parser.add_argument("--url", default="http://localhost:6333")
+    parser.add_argument("--recreate", action="store_true", help="無論是否變更都重建 (資料會清空)")
+    args = parser.parse_args()
+
+    qdrant = QdrantClient(url=args.url)
+    for name in args.names or SCHEMAS:
+        if name not in SCHEMAS:
+            raise SystemExit(f"❌ 未知的 collection: {name} (可用: {', '.join(SCHEMAS)})")
+        apply(qdrant, SCHEMAS[name](args.dim), recreate=args.recreate, dry_run=args.command == "plan")
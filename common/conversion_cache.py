@@ -0,0 +1,244 @@
+"""
+PDF 轉 Markdown 結果的持久化快取 (以頁為單位)。
+key = (頁面內容雜湊, 頁碼, 轉換器名稱, 轉換選項)；只改了一頁的 PDF 只需重新轉換那一頁。
+頁面內容雜湊由該頁的內容串流、頁面尺寸與引用的圖片資料計算。
+
+    python -m common.conversion_cache stats
+    python -m common.conversion_cache invalidate --converter docling-vlm
+    python -m common.conversion_cache invalidate --pdf CW/sample_table.pdf
+    python -m common.conversion_cache convert CW/example.pdf --converter pdfplumber -o out.md
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+import threading
+
+from common import CACHE_DIR
+
+DEFAULT_CACHE_PATH = os.environ.get("CONVERSION_CACHE_PATH", os.path.join(CACHE_DIR, "conversions.sqlite"))
+DEFAULT_MAX_BYTES = int(os.environ.get("CONVERSION_CACHE_MAX_BYTES", 512 * 1024 ** 2))
+
+
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def page_fingerprints(path):
+    """回傳每頁的內容雜湊 (依頁序)"""
+    import fitz  # PyMuPDF
+
+    fingerprints = []
+    with fitz.open(path) as doc:
+        for page in doc:
+            h = hashlib.sha256()
+            h.update(repr(tuple(page.rect)).encode())
+            h.update(str(page.rotation).encode())
+            h.update(page.read_contents())
+            for img in page.get_images(full=True):
+                h.update(hashlib.sha256(doc.xref_stream_raw(img[0]) or b"").digest())
+            fingerprints.append(h.hexdigest())
+    return fingerprints
+
+
+def options_key(converter_name, options):
+    return converter_name + "|" + json.dumps(options or {}, sort_keys=True, ensure_ascii=False, default=str)
+
+
+class ConversionCache:
+    """
+    以 SQLite 儲存每頁 Markdown，超過 max_bytes 時依最後使用時間 (LRU) 淘汰。
+    總大小在記憶體中累計，只有超過上限時才重新掃描全表
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " key TEXT PRIMARY KEY, pdf_hash TEXT NOT NULL, page_no INTEGER NOT NULL, converter TEXT NOT NULL,"
+            " markdown TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_pages_last_used ON pages(last_used)")
+        # 每頁的內容雜湊：invalidate(pdf_path) 依此找出屬於目前 PDF 的所有頁 (舊版資料庫沒有此欄位時補上)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(pages)")}
+        if "page_hash" not in columns:
+            self._conn.execute("ALTER TABLE pages ADD COLUMN page_hash TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_pages_page_hash ON pages(page_hash)")
+        self._conn.commit()
+        self._total = self._scan_total()
+
+    @staticmethod
+    def make_key(page_hash, page_no, converter_name, options):
+        raw = f"{page_hash}|{page_no}|{options_key(converter_name, options)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get_many(self, keys):
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, markdown FROM pages WHERE key IN ({','.join('?' * len(part))})", part
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._conn.executemany("UPDATE pages SET last_used = ? WHERE key = ?", [(now, k) for k in found])
+                self._conn.commit()
+        self.hits += len(found)
+        self.misses += len(set(keys)) - len(found)
+        return found
+
+    def put_many(self, rows):
+        """rows: [(key, pdf_hash, page_hash, page_no, converter_name, markdown)]"""
+        now = time.time()
+        rows = list({row[0]: row for row in rows}.values())
+        with self._lock:
+            # 被覆蓋的舊列要從累計大小扣掉 (以主鍵查詢，不掃全表)
+            replaced = 0
+            for i in range(0, len(rows), 500):
+                part = [row[0] for row in rows[i:i + 500]]
+                replaced += self._conn.execute(
+                    f"SELECT COALESCE(SUM(size), 0) FROM pages WHERE key IN ({','.join('?' * len(part))})", part
+                ).fetchone()[0]
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO pages (key, pdf_hash, page_hash, page_no, converter, markdown, size, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(k, h, ph, p, c, md, len(md.encode("utf-8")), now) for k, h, ph, p, c, md in rows],
+            )
+            self._conn.commit()
+            self._total += sum(len(row[5].encode("utf-8")) for row in rows) - replaced
+        if self._total > self.max_bytes:
+            self.evict()
+
+    def _scan_total(self):
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+
+    def evict(self):
+        # 累計值只反映本程序的寫入；真正淘汰前以全表掃描校正 (其他程序可能也寫入或已淘汰)
+        total = self._total = self._scan_total()
+        if total <= self.max_bytes:
+            return 0
+        with self._lock:
+            target = int(self.max_bytes * 0.9)
+            doomed = []
+            for key, size in self._conn.execute("SELECT key, size FROM pages ORDER BY last_used"):
+                if total <= target:
+                    break
+                doomed.append((key,))
+                total -= size
+            self._conn.executemany("DELETE FROM pages WHERE key = ?", doomed)
+            self._conn.commit()
+            self._total = total
+        return len(doomed)
+
+    def invalidate(self, converter_name=None, pdf_path=None):
+        """
+        刪除指定轉換器及/或指定 PDF 的快取；兩者皆未指定時清空全部。
+        PDF 以每頁的 (內容雜湊, 頁碼) 比對：快取命中的頁仍記著舊版檔案的 pdf_hash，只比對檔案雜湊會漏刪
+        """
+        converter_clause = " AND converter = ?" if converter_name else ""
+        converter_params = [converter_name] if converter_name else []
+        with self._lock:
+            if not pdf_path:
+                where = " WHERE converter = ?" if converter_name else ""
+                removed = self._conn.execute(f"DELETE FROM pages{where}", converter_params).rowcount
+            else:
+                pages = [(h, i + 1, *converter_params) for i, h in enumerate(page_fingerprints(pdf_path))]
+                removed = self._conn.executemany(
+                    f"DELETE FROM pages WHERE page_hash = ? AND page_no = ?{converter_clause}", pages).rowcount
+                # 舊版資料庫寫入的列沒有 page_hash，只能依檔案雜湊刪除
+                removed += self._conn.execute(
+                    f"DELETE FROM pages WHERE page_hash IS NULL AND pdf_hash = ?{converter_clause}",
+                    [file_hash(pdf_path), *converter_params]).rowcount
+            self._conn.commit()
+        self._total = self._scan_total()  # 不常呼叫，直接重新計算
+        return removed
+
+    def stats(self):
+        with self._lock:
+            count, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages").fetchone()
+        return {"pages": count, "bytes": size, "hits": self.hits, "misses": self.misses}
+
+
+def convert_pdf_cached(path, convert_fn, cache, converter_name, options=None):
+    """
+    convert_fn(path, page_numbers) -> {頁碼: Markdown}；page_numbers 為 None 時代表整份轉換。
+    只把快取沒有的頁交給 convert_fn，回傳依頁序排列的每頁 Markdown 清單。
+    """
+    pdf_hash = file_hash(path)
+    fingerprints = page_fingerprints(path)
+    keys = [cache.make_key(h, i + 1, converter_name, options) for i, h in enumerate(fingerprints)]
+    found = cache.get_many(keys)
+    missing = [i + 1 for i, k in enumerate(keys) if k not in found]
+
+    if missing:
+        converted = convert_fn(path, None if len(missing) == len(keys) else missing)
+        rows = []
+        for page_no in missing:
+            # 轉換器沒回傳的頁 (例如部分失敗) 不寫入快取，下次再重試；本次以空字串代替
+            if page_no not in converted:
+                continue
+            markdown = converted[page_no]
+            rows.append((keys[page_no - 1], pdf_hash, fingerprints[page_no - 1], page_no, converter_name, markdown))
+            found[keys[page_no - 1]] = markdown
+        if rows:
+            cache.put_many(rows)
+    return [found.get(k, "") for k in keys]
+
+
+def converter_fn(converter):
+    """把 common.converters 的轉換器包成 convert_fn"""
+    def convert(path, page_numbers):
+        if page_numbers is None:
+            return converter.convert_page_map(path)
+        return converter.convert_selected_pages(path, page_numbers)
+    return convert
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PDF 轉換結果快取")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats")
+    inv = sub.add_parser("invalidate")
+    inv.add_argument("--converter")
+    inv.add_argument("--pdf")
+    conv = sub.add_parser("convert")
+    conv.add_argument("pdf")
+    conv.add_argument("--converter", default="pdfplumber")
+    conv.add_argument("-o", "--output")
+    args = parser.parse_args()
+
+    cache = ConversionCache()
+    if args.command == "stats":
+        print(f"📦 快取位置: {cache.path}")
+        print(f"📊 {cache.stats()}")
+    elif args.command == "invalidate":
+        removed = cache.invalidate(args.converter, args.pdf)
+        print(f"🧹 已刪除 {removed} 頁快取")
+    else:
+        from common.converters import get_converter
+
+        converter = get_converter(args.converter)
+        start = time.perf_counter()
+        pages = convert_pdf_cached(args.pdf, converter_fn(converter), cache, converter.name, converter.options)
+        output = args.output or os.path.splitext(args.pdf)[0] + f"_{converter.name}.md"
+        with open(output, "w", encoding="utf-8") as f:
+            f.write("\n\n".join(p for p in pages if p))
+        print(f"✅ {len(pages)} 頁，耗時 {time.perf_counter() - start:.3f} 秒 (快取命中 {cache.hits} 頁)，"
+              f"結果已儲存至 {output}")
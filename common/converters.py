@@ -0,0 +1,147 @@
+"""
+PDF → Markdown 轉換器的共同介面 (對應 CW/05 的 docling / markitdown / pdfplumber 三支腳本)。
+
+    converter = get_converter("pdfplumber")
+    converter.load()                       # 冷啟動 (載入模型等)，可單獨計時
+    pages = converter.convert_pages("example.pdf")   # 每頁一段 Markdown
+"""
+
+
+class Converter:
+    name = "base"
+    page_level = False  # convert_selected_pages 是否真的只處理指定頁 (而非整份轉換後挑出)
+
+    def __init__(self, **options):
+        self.options = options
+        self._loaded = False
+
+    def load(self):
+        """載入模型或建立轉換器 (子類別實作)；只會執行一次"""
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+            self._loaded = True
+
+    def _convert_pages(self, path):
+        raise NotImplementedError
+
+    def convert_pages(self, path):
+        """回傳每頁的 Markdown 清單 (依頁序)"""
+        self._ensure_loaded()
+        return self._convert_pages(str(path))
+
+    def convert_page_map(self, path):
+        """整份轉換，回傳 {頁碼: Markdown}；轉換失敗的頁可以不出現 (快取會留待下次重試)"""
+        return dict(enumerate(self.convert_pages(path), start=1))
+
+    def convert_selected_pages(self, path, page_numbers):
+        """只轉換指定頁 (頁碼從 1 開始)，回傳 {頁碼: Markdown}；預設整份轉換後挑出"""
+        pages = self.convert_pages(path)
+        return {p: pages[p - 1] for p in page_numbers if p <= len(pages)}
+
+    def convert(self, path):
+        return "\n\n".join(p for p in self.convert_pages(path) if p)
+
+
+def docling_pages(result, page_numbers=None):
+    """
+    Docling ConversionResult → {頁碼: Markdown}。
+    FAILURE 直接丟出例外；PARTIAL_SUCCESS 時沒有產出內容的頁視為失敗、不回傳，
+    交給呼叫端 (例如 convert_pdf_cached) 下次重試，而不是把空白頁當成結果。
+    """
+    from docling.datamodel.base_models import ConversionStatus
+
+    if result.status == ConversionStatus.FAILURE:
+        raise RuntimeError(f"Docling 轉換失敗: {[e.error_message for e in result.errors]}")
+    document = result.document
+    partial = result.status != ConversionStatus.SUCCESS
+    pages = {}
+    for p in page_numbers or range(1, document.num_pages() + 1):
+        if p not in document.pages:
+            continue
+        markdown = document.export_to_markdown(page_no=p)
+        if partial and not markdown.strip():
+            continue
+        pages[p] = markdown
+    return pages
+
+
+class DoclingConverter(Converter):
+    name = "docling"
+    page_level = True
+
+    def load(self):
+        from docling.datamodel.base_models import InputFormat
+        from docling.document_converter import DocumentConverter
+
+        self.converter = self.options.get("document_converter") or DocumentConverter()
+        # DocumentConverter 延遲載入模型；在這裡先建好 PDF pipeline，冷啟動才包含模型載入
+        self.converter.initialize_pipeline(InputFormat.PDF)
+
+    def _convert_pages(self, path):
+        result = self.converter.convert(path)
+        pages = docling_pages(result)
+        return [pages.get(p, "") for p in range(1, result.document.num_pages() + 1)]
+
+    def convert_page_map(self, path):
+        self._ensure_loaded()
+        return docling_pages(self.converter.convert(str(path)))
+
+    def convert_selected_pages(self, path, page_numbers):
+        self._ensure_loaded()
+        pages = {}
+        for p in page_numbers:
+            pages.update(docling_pages(self.converter.convert(str(path), page_range=(p, p)), [p]))
+        return pages
+
+
+class MarkItDownConverter(Converter):
+    name = "markitdown"
+
+    def load(self):
+        from markitdown import MarkItDown
+
+        self.md = MarkItDown()
+
+    def _convert_pages(self, path):
+        text = self.md.convert(path).text_content
+        # PDF 由 pdfminer 擷取，頁與頁之間以換頁字元分隔
+        return text.split("\f") if "\f" in text else [text]
+
+
+class PdfPlumberConverter(Converter):
+    name = "pdfplumber"
+    page_level = True
+
+    def load(self):
+        import pdfplumber
+
+        self.pdfplumber = pdfplumber
+
+    @staticmethod
+    def _page_markdown(page_no, page):
+        text = page.extract_text()
+        return f"## Page {page_no}\n\n{text}\n\n---\n" if text else ""
+
+    def _convert_pages(self, path):
+        with self.pdfplumber.open(path) as pdf:
+            return [self._page_markdown(i + 1, page) for i, page in enumerate(pdf.pages)]
+
+    def convert_selected_pages(self, path, page_numbers):
+        self._ensure_loaded()
+        with self.pdfplumber.open(str(path)) as pdf:
+            return {p: self._page_markdown(p, pdf.pages[p - 1]) for p in page_numbers if p <= len(pdf.pages)}
+
+
+CONVERTERS = {
+    DoclingConverter.name: DoclingConverter,
+    MarkItDownConverter.name: MarkItDownConverter,
+    PdfPlumberConverter.name: PdfPlumberConverter,
+}
+
+
+def get_converter(name, **options):
+    if name not in CONVERTERS:
+        raise ValueError(f"未知的轉換器: {name} (可用: {', '.join(CONVERTERS)})")
+    return CONVERTERS[name](**options)
@@ -0,0 +1,190 @@
+"""
+統一的 Embedding 後端介面：遠端 /embed API、PyTorch SentenceTransformer、ONNX Runtime (動態 int8 量化)。
+三者都提供 embed(texts) / embed_one(text) / dimension，模型在第一次使用時才載入。
+
+用法：
+    backend = make_backend("onnx-int8", model_name="all-MiniLM-L6-v2")
+    vectors = backend.embed(["第一段", "第二段"])
+"""
+import os
+
+from common import CACHE_DIR
+
+ONNX_DIR = os.path.join(CACHE_DIR, "onnx")
+
+
+class EmbeddingBackend:
+    name = "base"
+
+    def __init__(self, batch_size=32):
+        self.batch_size = batch_size
+        self._loaded = False
+        self._dimension = None
+
+    def load(self):
+        """實際載入模型 (子類別實作)"""
+
+    def _encode(self, texts):
+        raise NotImplementedError
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+            self._loaded = True
+
+    def embed(self, texts):
+        self._ensure_loaded()
+        vectors = []
+        for i in range(0, len(texts), self.batch_size):
+            vectors.extend(self._encode(texts[i:i + self.batch_size]))
+        return vectors
+
+    def embed_one(self, text):
+        return self.embed([text])[0]
+
+    @property
+    def dimension(self):
+        if self._dimension is None:
+            self._dimension = len(self.embed_one("test"))
+        return self._dimension
+
+
+class RemoteAPIBackend(EmbeddingBackend):
+    """課程提供的遠端 /embed API (經過本地 Embedding 快取)"""
+    name = "remote"
+
+    def __init__(self, url="https://ws-04.wade0426.me/embed", task_description=None, normalize=True,
+                 batch_size=32, timeout=60):
+        super().__init__(batch_size)
+        self.url = url
+        self.task_description = task_description
+        self.normalize = normalize
+        self.timeout = timeout
+
+    def load(self):
+        import requests
+        from common.embed_cache import get_default_cache
+
+        self._session = requests.Session()
+        self._cache = get_default_cache()
+
+    def _fetch(self, texts):
+        payload = {"texts": texts, "normalize": self.normalize}
+        if self.task_description:
+            payload["task_description"] = self.task_description
+        response = self._session.post(self.url, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()["embeddings"]
+
+    def _encode(self, texts):
+        return self._cache.get_or_fetch(texts, self._fetch, model=self.url,
+                                        task_description=self.task_description or "", normalize=self.normalize)
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """程序內的 PyTorch SentenceTransformer (CW/02、HW/day7 原本的做法)"""
+    name = "torch"
+
+    def __init__(self, model_name="all-MiniLM-L6-v2", device="cpu", normalize=False, batch_size=32):
+        super().__init__(batch_size)
+        self.model_name = model_name
+        self.device = device
+        self.normalize = normalize
+
+    def load(self):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(self.model_name, device=self.device)
+
+    def _encode(self, texts):
+        return self.model.encode(texts, batch_size=self.batch_size,
+                                 normalize_embeddings=self.normalize).tolist()
+
+
+class OnnxInt8Backend(EmbeddingBackend):
+    """
+    ONNX Runtime + 動態 int8 量化 (CPU)。
+    第一次使用時把 HuggingFace 模型匯出成 ONNX 並量化，結果存在 .cache/onnx/ 之後直接沿用。
+    池化方式與 SentenceTransformer 的 MiniLM 系列一致 (attention mask 加權平均)。
+    """
+    name = "onnx-int8"
+
+    def __init__(self, model_name="all-MiniLM-L6-v2", normalize=False, batch_size=32, max_length=256,
+                 quantize=True, num_threads=None):
+        super().__init__(batch_size)
+        self.model_name = model_name
+        self.hf_name = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+        self.normalize = normalize
+        self.max_length = max_length
+        self.quantize = quantize
+        self.num_threads = num_threads
+
+    def _export(self, model_dir):
+        import torch
+        from transformers import AutoModel
+
+        fp32_path = os.path.join(model_dir, "model.onnx")
+        if not os.path.exists(fp32_path):
+            print(f"📦 匯出 ONNX 模型: {self.hf_name}")
+            model = AutoModel.from_pretrained(self.hf_name).eval()
+            sample = self.tokenizer(["export"], return_tensors="pt")
+            names = list(sample.keys())
+            dynamic_axes = {n: {0: "batch", 1: "seq"} for n in names}
+            dynamic_axes["last_hidden_state"] = {0: "batch", 1: "seq"}
+            with torch.no_grad():
+                torch.onnx.export(model, tuple(sample[n] for n in names), fp32_path, input_names=names,
+                                  output_names=["last_hidden_state"], dynamic_axes=dynamic_axes, opset_version=14)
+        if not self.quantize:
+            return fp32_path
+
+        int8_path = os.path.join(model_dir, "model.int8.onnx")
+        if not os.path.exists(int8_path):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            print("🔧 動態 int8 量化中...")
+            quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+        return int8_path
+
+    def load(self):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        model_dir = os.path.join(ONNX_DIR, self.hf_name.replace("/", "__"))
+        os.makedirs(model_dir, exist_ok=True)
+        self.tokenizer = AutoTokenizer.from_pretrained(self.hf_name)
+        model_path = self._export(model_dir)
+
+        options = ort.SessionOptions()
+        if self.num_threads:
+            options.intra_op_num_threads = self.num_threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def _encode(self, texts):
+        import numpy as np
+
+        encoded = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="np")
+        feeds = {k: v.astype(np.int64) for k, v in encoded.items() if k in self.input_names}
+        hidden = self.session.run(None, feeds)[0]
+        mask = encoded["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.normalize:
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.tolist()
+
+
+BACKENDS = {
+    RemoteAPIBackend.name: RemoteAPIBackend,
+    SentenceTransformerBackend.name: SentenceTransformerBackend,
+    OnnxInt8Backend.name: OnnxInt8Backend,
+}
+
+
+def make_backend(kind=None, **kwargs):
+    """依名稱建立後端；kind 未指定時讀取環境變數 EMBED_BACKEND (預設 torch)"""
+    kind = kind or os.environ.get("EMBED_BACKEND", "torch")
+    if kind not in BACKENDS:
+        raise ValueError(f"未知的 Embedding 後端: {kind} (可用: {', '.join(BACKENDS)})")
+    if kind == "remote":
+        kwargs.pop("model_name", None)
+    return BACKENDS[kind](**kwargs)
@@ -0,0 +1,180 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+
+from common import CACHE_DIR
+
+# --- 基本設定 ---
+DEFAULT_CACHE_PATH = os.environ.get("EMBED_CACHE_PATH", os.path.join(CACHE_DIR, "embeddings.sqlite"))
+DEFAULT_MAX_BYTES = int(os.environ.get("EMBED_CACHE_MAX_BYTES", 2 * 1024 ** 3))  # 預設上限 2GB
+
+
+def make_key(model, text, task_description="", normalize=True):
+    """以 (模型/端點, 任務描述, 是否正規化, 文本) 計算內容定址的快取 key"""
+    h = hashlib.sha256()
+    for part in (model, task_description or "", "1" if normalize else "0"):
+        h.update(part.encode("utf-8"))
+        h.update(b"\x00")
+    h.update(text.encode("utf-8"))
+    return h.hexdigest()
+
+
+class EmbeddingCache:
+    """
+    以 SQLite 儲存 float32 向量的持久化快取。
+    - 內容定址：同一段文本在同一組設定下只會呼叫一次 /embed
+    - 超過 max_bytes 時依最後使用時間 (LRU) 淘汰；總大小在記憶體中累計，只有超過上限時才重新掃描全表
+    - hits / misses 計數器可用來確認重跑實驗時是否幾乎不打 API
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY, dim INTEGER NOT NULL, vec BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        self._total = self._scan_total()
+
+    # --- 讀寫 ---
+    def get_many(self, keys):
+        """回傳 {key: 向量(list[float])}，只包含命中的 key"""
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            for i in range(0, len(unique), 500):  # SQLite 參數數量上限
+                part = unique[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vec FROM embeddings WHERE key IN ({','.join('?' * len(part))})", part
+                ).fetchall()
+                for key, blob in rows:
+                    vec = array("f")
+                    vec.frombytes(blob)
+                    found[key] = vec.tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, k) for k in found]
+                )
+                self._conn.commit()
+        return found
+
+    def put_many(self, items):
+        """items: [(key, 向量)]，寫入後視需要淘汰舊資料"""
+        now = time.time()
+        rows = list({k: (k, len(v), array("f", v).tobytes(), now) for k, v in items}.values())
+        with self._lock:
+            # 被覆蓋的舊向量要從累計大小扣掉 (以主鍵查詢，不掃全表)
+            replaced = 0
+            for i in range(0, len(rows), 500):
+                part = [r[0] for r in rows[i:i + 500]]
+                replaced += self._conn.execute(
+                    f"SELECT COALESCE(SUM(LENGTH(vec)), 0) FROM embeddings WHERE key IN ({','.join('?' * len(part))})",
+                    part,
+                ).fetchone()[0]
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+            self._conn.commit()
+            self._total += sum(len(r[2]) for r in rows) - replaced
+        if self._total > self.max_bytes:
+            self.evict()
+
+    def get_or_fetch(self, texts, fetch_fn, model, task_description="", normalize=True):
+        """
+        先查快取，只把未命中的文本交給 fetch_fn(list[str]) -> list[向量] 取得向量。
+        回傳與 texts 等長、順序一致的向量清單；fetch_fn 回傳 None 的位置保留為 None。
+        """
+        keys = [make_key(model, t, task_description, normalize) for t in texts]
+        found = self.get_many(keys)
+        missing = list(dict.fromkeys(k for k in keys if k not in found))
+        miss_count = sum(1 for k in keys if k not in found)
+        self.hits += len(keys) - miss_count
+        self.misses += miss_count
+
+        if missing:
+            key_to_text = dict(zip(keys, texts))
+            fetched = fetch_fn([key_to_text[k] for k in missing]) or []
+            new_items = [(k, v) for k, v in zip(missing, fetched) if v is not None]
+            if new_items:
+                self.put_many(new_items)
+                found.update(new_items)
+        return [found.get(k) for k in keys]
+
+    # --- 容量管理 ---
+    def _scan_total(self):
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(LENGTH(vec)), 0) FROM embeddings").fetchone()[0]
+
+    def total_bytes(self):
+        """目前累計的向量大小 (不掃描資料表)"""
+        return self._total
+
+    def evict(self):
+        """超過容量上限時，從最久未使用的向量開始刪除，刪到上限的 90%"""
+        # 累計值只反映本程序的寫入；真正淘汰前以全表掃描校正 (其他程序可能也寫入或已淘汰)
+        total = self._total = self._scan_total()
+        if total <= self.max_bytes:
+            return 0
+        target = int(self.max_bytes * 0.9)
+        removed = 0
+        with self._lock:
+            cursor = self._conn.execute("SELECT key, LENGTH(vec) FROM embeddings ORDER BY last_used")
+            doomed = []
+            for key, size in cursor:
+                if total <= target:
+                    break
+                doomed.append((key,))
+                total -= size
+            self._conn.executemany("DELETE FROM embeddings WHERE key = ?", doomed)
+            self._conn.commit()
+            self._total = total
+            removed = len(doomed)
+        return removed
+
+    def stats(self):
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return {"entries": count, "bytes": self.total_bytes(), "hits": self.hits, "misses": self.misses}
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._total = 0
+
+    def close(self):
+        self._conn.close()
+
+
+_default_cache = None
+
+
+def get_default_cache():
+    """同一個程序內共用一個快取連線"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = EmbeddingCache()
+    return _default_cache
+
+
+if __name__ == "__main__":
+    import sys
+
+    cache = EmbeddingCache()
+    if len(sys.argv) > 1 and sys.argv[1] == "clear":
+        cache.clear()
+        print(f"🧹 已清空快取: {cache.path}")
+    else:
+        print(f"📦 快取位置: {cache.path}")
+        print(f"📊 {cache.stats()}")
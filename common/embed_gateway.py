@@ -0,0 +1,167 @@
+"""
+查詢階段的動態微批次 (micro-batching) Embedding 閘道。
+
+- 程序內：MicroBatcher(fetch_fn).embed(text) 會把短時間窗內 (預設 5 ms 或滿 64 筆)
+  同時到達的單筆請求合併成一次批次呼叫，再把結果分送回各呼叫端。
+- 獨立程序：python -m common.embed_gateway --upstream https://ws-04.wade0426.me/embed
+  會在本機開一個與遠端 /embed 相同格式的服務，多個腳本同時查詢時共用批次。
+"""
+import argparse
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """收集並合併併發的單筆 Embedding 請求；fetch_fn(list[str]) -> list[向量]"""
+
+    def __init__(self, fetch_fn, window_ms=5, max_batch=64, max_inflight=4):
+        self.fetch_fn = fetch_fn
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.batches = 0
+        self.items = 0
+        self._queue = queue.Queue()
+        self._pool = ThreadPoolExecutor(max_workers=max_inflight, thread_name_prefix="embed-batch")
+        self._collector = threading.Thread(target=self._collect_loop, daemon=True)
+        self._collector.start()
+
+    def submit(self, text):
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def embed(self, text, timeout=None):
+        """單筆查詢：阻塞直到所屬批次完成"""
+        return self.submit(text).result(timeout=timeout)
+
+    def embed_many(self, texts, timeout=None):
+        futures = [self.submit(t) for t in texts]
+        return [f.result(timeout=timeout) for f in futures]
+
+    def _collect_loop(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch = [first]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    self._queue.put(_STOP)
+                    break
+                batch.append(item)
+            self._pool.submit(self._dispatch, batch)
+
+    def _dispatch(self, batch):
+        texts = [t for t, _ in batch]
+        try:
+            vectors = self.fetch_fn(texts)
+            if vectors is None or len(vectors) != len(texts):
+                raise RuntimeError(f"批次回傳 {0 if vectors is None else len(vectors)} 筆，預期 {len(texts)} 筆")
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        self.batches += 1
+        self.items += len(texts)
+        for (_, future), vec in zip(batch, vectors):
+            future.set_result(vec)
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._collector.join()
+        self._pool.shutdown(wait=True)
+
+
+# --- 獨立閘道程序 ---
+
+def make_upstream_fetch(upstream_url, task_description, normalize, timeout=60):
+    import requests
+
+    session = requests.Session()
+
+    def fetch(texts):
+        payload = {"texts": texts, "normalize": normalize}
+        if task_description:
+            payload["task_description"] = task_description
+        response = session.post(upstream_url, json=payload, timeout=timeout)
+        response.raise_for_status()
+        return response.json()["embeddings"]
+
+    return fetch
+
+
+class GatewayHandler(BaseHTTPRequestHandler):
+    upstream_url = None
+    window_ms = 5
+    max_batch = 64
+    batchers = {}
+    _lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _batcher(self, task_description, normalize):
+        key = (task_description or "", bool(normalize))
+        with self._lock:
+            if key not in self.batchers:
+                fetch = make_upstream_fetch(self.upstream_url, task_description, normalize)
+                self.batchers[key] = MicroBatcher(fetch, self.window_ms, self.max_batch)
+            return self.batchers[key]
+
+    def do_POST(self):
+        if self.path != "/embed":
+            return self._send({"error": "not found"}, 404)
+        data = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        batcher = self._batcher(data.get("task_description"), data.get("normalize", True))
+        try:
+            embeddings = batcher.embed_many(data.get("texts", []), timeout=120)
+        except Exception as e:
+            return self._send({"error": str(e)}, 502)
+        self._send({"embeddings": embeddings})
+
+    def _send(self, data, status=200):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve(upstream_url, host="127.0.0.1", port=8765, window_ms=5, max_batch=64):
+    GatewayHandler.upstream_url = upstream_url
+    GatewayHandler.window_ms = window_ms
+    GatewayHandler.max_batch = max_batch
+    server = ThreadingHTTPServer((host, port), GatewayHandler)
+    server.daemon_threads = True
+    print(f"🚪 Embedding 閘道啟動: http://{host}:{server.server_address[1]}/embed → {upstream_url}")
+    print(f"   時間窗 {window_ms} ms / 單批上限 {max_batch} 筆")
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="查詢階段微批次 Embedding 閘道")
+    parser.add_argument("--upstream", default="https://ws-04.wade0426.me/embed")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--window-ms", type=float, default=5)
+    parser.add_argument("--max-batch", type=int, default=64)
+    args = parser.parse_args()
+    try:
+        serve(args.upstream, args.host, args.port, args.window_ms, args.max_batch).serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 閘道已停止")
@@ -0,0 +1,114 @@
+"""
+增量匯入用的檔案指紋清單 (manifest)。
+記錄每個來源檔的 (大小, 修改時間, 內容雜湊) 以及每個 chunk 的雜湊與對應的 point id，
+重跑匯入時只需向量化新增/變更的 chunk，並刪除已不存在的 chunk 對應的點。
+"""
+import os
+import json
+import uuid
+import hashlib
+from collections import defaultdict
+
+from common import CACHE_DIR
+
+MANIFEST_DIR = os.path.join(CACHE_DIR, "manifests")
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def file_fingerprint(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": h.hexdigest()}
+
+
+def random_point_id(text, index):
+    return str(uuid.uuid4())
+
+
+class IngestManifest:
+    """
+    config 用來記錄會影響向量的設定 (模型、維度、切塊方式...)，
+    與上次不同時 reset 為 True，呼叫端應重建 collection 並全量匯入。
+    """
+
+    def __init__(self, name, config=None, directory=MANIFEST_DIR):
+        self.path = os.path.join(directory, f"{name}.json")
+        self.config = config or {}
+        self.files = {}
+        self.reset = True
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("config") == self.config:
+                self.files = data.get("files", {})
+                self.reset = False
+
+    def clear(self):
+        self.files = {}
+
+    def check(self, key, path):
+        """回傳新的檔案指紋；檔案沒有變動時回傳 None (大小與時間相同時不必重算雜湊)"""
+        old = self.files.get(key)
+        stat = os.stat(path)
+        if old and old["size"] == stat.st_size and old["mtime"] == stat.st_mtime:
+            return None
+        fingerprint = file_fingerprint(path)
+        if old and old["sha256"] == fingerprint["sha256"]:
+            old["mtime"] = fingerprint["mtime"]  # 只是被 touch，內容相同
+            return None
+        return fingerprint
+
+    def sync_file(self, key, fingerprint, chunk_texts, make_id=random_point_id):
+        """
+        比對新舊 chunk 雜湊：內容相同的 chunk 沿用舊 id，不必重新向量化。
+        回傳 (new_items, stale_ids)；new_items 為 [(point_id, chunk 序號, 文本)]，
+        stale_ids 為需要從向量庫刪除的舊 point id。
+        """
+        old_ids = defaultdict(list)
+        for record in self.files.get(key, {}).get("chunks", []):
+            old_ids[record["hash"]].append(record["id"])
+
+        records, new_items = [], []
+        for index, text in enumerate(chunk_texts):
+            h = text_hash(text)
+            if old_ids[h]:
+                point_id = old_ids[h].pop(0)
+            else:
+                point_id = make_id(text, index)
+                new_items.append((point_id, index, text))
+            records.append({"hash": h, "id": point_id})
+
+        stale_ids = [pid for ids in old_ids.values() for pid in ids]
+        self.files[key] = {**fingerprint, "chunks": records}
+        return new_items, stale_ids
+
+    def drop_missing(self, present_keys):
+        """移除已經不存在的來源檔，回傳其所有 point id"""
+        stale_ids = []
+        for key in list(self.files):
+            if key not in present_keys:
+                stale_ids.extend(r["id"] for r in self.files.pop(key)["chunks"])
+        return stale_ids
+
+    def id_sources(self):
+        """{point_id: [來源...]}；同一內容出現在多個檔案時，一個 id 會對應多個來源"""
+        sources = {}
+        for key, entry in self.files.items():
+            for record in entry["chunks"]:
+                ids = sources.setdefault(record["id"], [])
+                if key not in ids:
+                    ids.append(key)
+        return sources
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"config": self.config, "files": self.files}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,226 @@
+"""
+行程內的中文倒排索引 (BM25) 與本地 RRF 融合，不需要第二個服務。
+- 切詞與 common.bm25_sparse 相同 (中文字元 bigram、英數字單字)，"A14" 這類關鍵字可直接命中
+- postings 以 array 儲存 (文件編號 uint32 + 詞頻 uint16)，匯入時可逐筆新增/刪除
+- 刪除先做標記，存檔前壓縮；索引存在 .cache/stores/<name>/，與 chunk store 放在同一處
+- 存檔時 postings 寫成新一代的 lexical_*.<代>.bin (先寫 .tmp 再 os.replace)，最後才替換 lexical_meta.json；
+  meta 指向哪一代就讀哪一代，中途當掉也不會讀到新舊混雜的檔案
+
+    index = InvertedIndex.open("gemma_multi_turn_rag")
+    index.add(point_id, text)
+    index.save()
+    fused = rrf_fuse([dense_ids, [i for i, _ in index.search(query, 10)]])
+"""
+import os
+import json
+import math
+import heapq
+from array import array
+from collections import Counter, defaultdict
+from operator import itemgetter
+
+from common import CACHE_DIR
+from common.bm25_sparse import tokenize
+
+STORE_DIR = os.path.join(CACHE_DIR, "stores")
+MAX_TF = 65535
+ARRAY_NAMES = {"docs": "I", "tfs": "H", "offsets": "Q", "doc_len": "I"}  # 存檔的陣列與型別
+
+
+def _array_path(path, name, generation):
+    # generation 0 為舊版不分代的檔名
+    return os.path.join(path, f"lexical_{name}.{generation}.bin" if generation else f"lexical_{name}.bin")
+
+
+def store_path(name, directory=STORE_DIR):
+    return os.path.join(directory, name)
+
+
+def rrf_fuse(rankings, k=60, limit=None):
+    """Reciprocal Rank Fusion：rankings 為多個依名次排列的 id 清單，回傳 [(id, 分數)]"""
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            scores[item] += 1.0 / (k + rank + 1)
+    fused = sorted(scores.items(), key=itemgetter(1), reverse=True)
+    return fused[:limit] if limit else fused
+
+
+class InvertedIndex:
+    def __init__(self, path=None, k1=1.2, b=0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.clear()
+
+    def clear(self):
+        self.terms = []              # 詞彙編號 -> token
+        self.vocab = {}              # token -> 詞彙編號
+        self.post_docs = []          # 詞彙編號 -> array('I') 文件編號
+        self.post_tfs = []           # 詞彙編號 -> array('H') 詞頻
+        self.df = array("I")         # 詞彙編號 -> 仍存在的文件數
+        self.doc_ids = []            # 文件編號 -> 外部 id
+        self.doc_num = {}            # 外部 id -> 文件編號
+        self.doc_len = array("I")
+        self.doc_terms = []          # 文件編號 -> array('I') 詞彙編號；已刪除為 None
+        self.live = 0
+        self.total_len = 0
+
+    def __len__(self):
+        return self.live
+
+    def __contains__(self, doc_id):
+        return doc_id in self.doc_num
+
+    def _term(self, token):
+        term = self.vocab.get(token)
+        if term is None:
+            term = self.vocab[token] = len(self.terms)
+            self.terms.append(token)
+            self.post_docs.append(array("I"))
+            self.post_tfs.append(array("H"))
+            self.df.append(0)
+        return term
+
+    def add(self, doc_id, text):
+        """新增一筆；id 已存在時取代舊內容"""
+        if doc_id in self.doc_num:
+            self.remove(doc_id)
+        tokens = tokenize(text)
+        num = len(self.doc_ids)
+        terms = array("I")
+        for token, tf in Counter(tokens).items():
+            term = self._term(token)
+            self.post_docs[term].append(num)
+            self.post_tfs[term].append(min(tf, MAX_TF))
+            self.df[term] += 1
+            terms.append(term)
+        self.doc_ids.append(doc_id)
+        self.doc_num[doc_id] = num
+        self.doc_len.append(len(tokens))
+        self.doc_terms.append(terms)
+        self.live += 1
+        self.total_len += len(tokens)
+
+    def remove(self, doc_id):
+        num = self.doc_num.pop(doc_id, None)
+        if num is None:
+            return False
+        for term in self.doc_terms[num]:
+            self.df[term] -= 1
+        self.doc_terms[num] = None
+        self.live -= 1
+        self.total_len -= self.doc_len[num]
+        return True
+
+    def search(self, query, limit=10):
+        """BM25 排序，回傳 [(id, 分數)]"""
+        if not self.live:
+            return []
+        avg_len = self.total_len / self.live or 1.0
+        scores = defaultdict(float)
+        for token in dict.fromkeys(tokenize(query)):
+            term = self.vocab.get(token)
+            if term is None or not self.df[term]:
+                continue
+            df = self.df[term]
+            idf = math.log(1 + (self.live - df + 0.5) / (df + 0.5))
+            for num, tf in zip(self.post_docs[term], self.post_tfs[term]):
+                if self.doc_terms[num] is None:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.doc_len[num] / avg_len)
+                scores[num] += idf * tf * (self.k1 + 1) / (tf + norm)
+        top = heapq.nlargest(limit, scores.items(), key=itemgetter(1))
+        return [(self.doc_ids[num], score) for num, score in top]
+
+    def compact(self):
+        """移除已刪除文件的 postings 並重新編號"""
+        if self.live == len(self.doc_ids):
+            return
+        remap = {}
+        doc_ids, doc_len, doc_terms = [], array("I"), []
+        for num, terms in enumerate(self.doc_terms):
+            if terms is not None:
+                remap[num] = len(doc_ids)
+                doc_ids.append(self.doc_ids[num])
+                doc_len.append(self.doc_len[num])
+                doc_terms.append(terms)
+        for term in range(len(self.terms)):
+            docs, tfs = array("I"), array("H")
+            for num, tf in zip(self.post_docs[term], self.post_tfs[term]):
+                if num in remap:
+                    docs.append(remap[num])
+                    tfs.append(tf)
+            self.post_docs[term], self.post_tfs[term] = docs, tfs
+        self.doc_ids, self.doc_len, self.doc_terms = doc_ids, doc_len, doc_terms
+        self.doc_num = {doc_id: num for num, doc_id in enumerate(doc_ids)}
+
+    def save(self, path=None):
+        path = path or self.path
+        self.compact()
+        os.makedirs(path, exist_ok=True)
+        offsets = array("Q", [0])
+        docs, tfs = array("I"), array("H")
+        for term in range(len(self.terms)):
+            docs.extend(self.post_docs[term])
+            tfs.extend(self.post_tfs[term])
+            offsets.append(len(docs))
+        meta_path = os.path.join(path, "lexical_meta.json")
+        old_generation = None
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                old_generation = json.load(f).get("generation", 0)
+        generation = (old_generation or 0) + 1
+        for name, data in (("docs", docs), ("tfs", tfs), ("offsets", offsets), ("doc_len", self.doc_len)):
+            file_path = _array_path(path, name, generation)
+            with open(file_path + ".tmp", "wb") as f:
+                data.tofile(f)
+            os.replace(file_path + ".tmp", file_path)
+        # meta 替換完成才算存檔成功 (指向新一代)；之後才刪掉上一代的檔案
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b, "generation": generation, "terms": self.terms,
+                       "doc_ids": self.doc_ids}, f, ensure_ascii=False)
+        os.replace(meta_path + ".tmp", meta_path)
+        if old_generation is not None:
+            for name in ARRAY_NAMES:
+                old_path = _array_path(path, name, old_generation)
+                if os.path.exists(old_path):
+                    os.remove(old_path)
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, "lexical_meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        index = cls(path, k1=meta["k1"], b=meta["b"])
+        arrays = {}
+        for name, code in ARRAY_NAMES.items():
+            file_path = _array_path(path, name, meta.get("generation", 0))
+            arrays[name] = array(code)
+            with open(file_path, "rb") as f:
+                arrays[name].frombytes(f.read())
+
+        index.terms = meta["terms"]
+        index.vocab = {token: term for term, token in enumerate(index.terms)}
+        index.doc_ids = meta["doc_ids"]
+        index.doc_num = {doc_id: num for num, doc_id in enumerate(index.doc_ids)}
+        index.doc_len = arrays["doc_len"]
+        index.doc_terms = [array("I") for _ in index.doc_ids]
+        offsets = arrays["offsets"]
+        for term in range(len(index.terms)):
+            start, end = offsets[term], offsets[term + 1]
+            index.post_docs.append(arrays["docs"][start:end])
+            index.post_tfs.append(arrays["tfs"][start:end])
+            index.df.append(end - start)
+            for num in index.post_docs[term]:
+                index.doc_terms[num].append(term)
+        index.live = len(index.doc_ids)
+        index.total_len = sum(index.doc_len)
+        return index
+
+    @classmethod
+    def open(cls, name, directory=STORE_DIR):
+        """已有存檔時載入，否則建立空索引 (save() 會寫回同一位置)"""
+        path = store_path(name, directory)
+        if os.path.exists(os.path.join(path, "lexical_meta.json")):
+            return cls.load(path)
+        return cls(path)
@@ -0,0 +1,220 @@
+"""
+行程內的精確搜尋向量索引 (小型/中型語料用，不需要 Qdrant 伺服器)。
+- 所有向量放在同一個連續的 float32 矩陣，容量不足時加倍擴充
+- 一次矩陣乘法同時支援 cosine / dot / euclid 三種度量 (分數定義與 Qdrant 相同：euclid 為距離，越小越近)
+- 批次查詢以 argpartition 取 top-k，可依 payload 過濾
+- search_batch_metrics 一次回答多種度量；向量已正規化時三者排名等價，只排序一次
+- save / load 使用 .npy (load 預設以 mmap 開啟) + payload JSON
+
+    index = NumpyIndex(dim=8)
+    index.add(vectors, payloads=[{"original_idx": i} for i in range(len(vectors))])
+    hits = index.search(query, limit=3, metric="euclid")   # [Hit(id, score, payload)]
+"""
+import os
+import json
+from collections import namedtuple
+
+import numpy as np
+
+Hit = namedtuple("Hit", ["id", "score", "payload"])
+
+METRICS = ("cosine", "dot", "euclid")
+
+
+def _match(payload, conditions):
+    return all(payload.get(key) == value for key, value in conditions.items())
+
+
+class NumpyIndex:
+    def __init__(self, dim, capacity=1024):
+        self.dim = dim
+        self._data = np.empty((capacity, dim), dtype=np.float32)
+        self._sq_norms = np.empty(capacity, dtype=np.float32)
+        self._size = 0
+        self.ids = []
+        self.payloads = []
+        self._row_of = {}
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def vectors(self):
+        return self._data[:self._size]
+
+    def _reserve(self, needed):
+        capacity = len(self._data)
+        if needed <= capacity and self._data.flags.writeable:
+            return
+        while capacity < needed:
+            capacity = max(capacity * 2, 1)
+        data = np.empty((capacity, self.dim), dtype=np.float32)
+        sq_norms = np.empty(capacity, dtype=np.float32)
+        data[:self._size] = self._data[:self._size]
+        sq_norms[:self._size] = self._sq_norms[:self._size]
+        self._data, self._sq_norms = data, sq_norms
+
+    def add(self, vectors, payloads=None, ids=None):
+        """新增向量；ids 已存在時覆寫該筆 (upsert)。回傳這批的 id 清單"""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        count = len(vectors)
+        payloads = payloads if payloads is not None else [{} for _ in range(count)]
+        if ids is None:
+            ids = list(range(self._size, self._size + count))
+        if not len(payloads) == len(ids) == count:
+            raise ValueError("vectors、payloads 與 ids 的數量必須相同")
+
+        rows = []
+        new = sum(1 for point_id in ids if point_id not in self._row_of)
+        self._reserve(self._size + new)
+        for point_id, payload in zip(ids, payloads):
+            row = self._row_of.get(point_id)
+            if row is None:
+                row = self._row_of[point_id] = self._size
+                self._size += 1
+                self.ids.append(point_id)
+                self.payloads.append(payload)
+            else:
+                self.payloads[row] = payload
+            rows.append(row)
+        rows = np.asarray(rows)
+        self._data[rows] = vectors
+        self._sq_norms[rows] = np.einsum("ij,ij->i", vectors, vectors)
+        return list(ids)
+
+    def set_payload(self, point_id, payload):
+        """合併更新某個點的 payload (同 Qdrant set_payload，只覆蓋給定的欄位)"""
+        row = self._row_of[point_id]
+        self.payloads[row] = {**self.payloads[row], **payload}
+
+    def _filter_mask(self, filter):
+        """filter 可以是 {欄位: 值} (全部相等才符合) 或 callable(payload) -> bool"""
+        check = filter if callable(filter) else (lambda payload: _match(payload, filter))
+        return np.fromiter((check(p) for p in self.payloads), dtype=bool, count=self._size)
+
+    def scores(self, queries, metric="cosine"):
+        """回傳 (查詢數, 向量數) 的分數矩陣；三種度量都由同一次 queries @ vectors.T 推得"""
+        if metric not in METRICS:
+            raise ValueError(f"未知的度量: {metric} (可用: {', '.join(METRICS)})")
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        dots = queries @ self.vectors.T
+        if metric == "dot":
+            return dots
+        q_sq = np.einsum("ij,ij->i", queries, queries)[:, None]
+        m_sq = self._sq_norms[:self._size][None, :]
+        if metric == "cosine":
+            return dots / np.maximum(np.sqrt(q_sq * m_sq), 1e-12)
+        return np.sqrt(np.maximum(q_sq + m_sq - 2 * dots, 0))
+
+    def search_batch(self, queries, limit=10, metric="cosine", filter=None):
+        """批次查詢，回傳每個查詢的 [Hit]，依相似度由高到低 (euclid 由近到遠)"""
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        if self._size == 0 or limit <= 0:
+            return [[] for _ in range(len(queries))]
+        scores = self.scores(queries, metric)
+        # 一律轉成「越大越好」再取 top-k
+        keys = -scores if metric == "euclid" else scores.copy()
+        if filter:
+            keys[:, ~self._filter_mask(filter)] = -np.inf
+
+        k = min(limit, self._size)
+        if k < self._size:
+            top = np.argpartition(-keys, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(self._size), (len(queries), self._size))
+        order = np.argsort(-np.take_along_axis(keys, top, axis=1), axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+
+        results = []
+        for qi, rows in enumerate(top):
+            results.append([
+                Hit(self.ids[row], float(scores[qi, row]), self.payloads[row])
+                for row in rows if keys[qi, row] != -np.inf
+            ])
+        return results
+
+    def search(self, query, limit=10, metric="cosine", filter=None):
+        return self.search_batch([query], limit, metric, filter)[0]
+
+    def is_normalized(self, tol=1e-3):
+        """所有向量長度皆為 1 時，cosine / dot / euclid 對同一個查詢的排名完全相同"""
+        return self._size > 0 and bool(np.all(np.abs(self._sq_norms[:self._size] - 1) <= tol))
+
+    def search_batch_metrics(self, queries, metrics=METRICS, limit=10, filter=None):
+        """
+        同一份矩陣一次回答多種度量，回傳 {metric: 每個查詢的 [Hit]}。
+        向量已正規化時只以內積排序一次，其他度量的分數由同一個內積換算
+        (cosine = dot / |q|，euclid = sqrt(|q|² + |m|² - 2·dot))。
+        """
+        for metric in metrics:
+            if metric not in METRICS:
+                raise ValueError(f"未知的度量: {metric} (可用: {', '.join(METRICS)})")
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        if len(set(metrics)) == 1 or not self.is_normalized():
+            return {metric: self.search_batch(queries, limit, metric, filter) for metric in metrics}
+
+        base = self.search_batch(queries, limit, "dot", filter)
+        q_sq = np.einsum("ij,ij->i", queries, queries)
+        results = {}
+        for metric in metrics:
+            if metric == "dot":
+                results[metric] = base
+            elif metric == "cosine":
+                results[metric] = [
+                    [h._replace(score=h.score / max(float(np.sqrt(q_sq[qi])), 1e-12)) for h in hits]
+                    for qi, hits in enumerate(base)
+                ]
+            else:
+                results[metric] = [
+                    [h._replace(score=float(np.sqrt(max(
+                        q_sq[qi] + self._sq_norms[self._row_of[h.id]] - 2 * h.score, 0)))) for h in hits]
+                    for qi, hits in enumerate(base)
+                ]
+        return results
+
+    def save(self, directory):
+        """先寫到 .tmp 再替換：load() 的 mmap 可能正指向原檔，直接覆寫會截斷正在讀的資料"""
+        os.makedirs(directory, exist_ok=True)
+        for name, array in (("vectors.npy", self.vectors), ("sq_norms.npy", self._sq_norms[:self._size])):
+            tmp_path = os.path.join(directory, name + ".tmp")
+            with open(tmp_path, "wb") as f:
+                np.save(f, array)
+            os.replace(tmp_path, os.path.join(directory, name))
+        tmp_path = os.path.join(directory, "payloads.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "ids": self.ids, "payloads": self.payloads}, f, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(directory, "payloads.json"))
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """mmap=True 時向量以唯讀 mmap 開啟，第一次寫入才會複製到記憶體"""
+        with open(os.path.join(directory, "payloads.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        mode = "r" if mmap else None
+        index = cls(meta["dim"], capacity=0)
+        index._data = np.load(os.path.join(directory, "vectors.npy"), mmap_mode=mode)
+        index._sq_norms = np.load(os.path.join(directory, "sq_norms.npy"), mmap_mode=mode)
+        index._size = len(index._data)
+        index.ids = meta["ids"]
+        index.payloads = meta["payloads"]
+        index._row_of = {point_id: row for row, point_id in enumerate(index.ids)}
+        return index
+
+
+if __name__ == "__main__":
+    # 自我檢查：save → load(mmap) → 原地 save → load 仍能還原同一份索引
+    import tempfile
+
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(1000, 8)).astype(np.float32)
+    index = NumpyIndex(8)
+    index.add(vectors, payloads=[{"i": i} for i in range(len(vectors))])
+    with tempfile.TemporaryDirectory() as directory:
+        index.save(directory)
+        for _ in range(2):
+            loaded = NumpyIndex.load(directory)
+            loaded.save(directory)
+        loaded = NumpyIndex.load(directory)
+        assert np.array_equal(np.asarray(loaded.vectors), vectors) and loaded.ids == index.ids
+        assert loaded.search(vectors[3], limit=1)[0].id == index.ids[3]
+    print("✅ save / load 往返一致")
@@ -0,0 +1,41 @@
+import os
+
+import requests
+
+# --- 基本設定 ---
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434")
+OLLAMA_MODEL = os.environ.get("OLLAMA_EMBED_MODEL", "llama3")
+
+
+def embed_one_by_one(texts, model=OLLAMA_MODEL, base_url=OLLAMA_URL, session=None):
+    """舊版 /api/embeddings：每段文本一次 HTTP 請求"""
+    http = session or requests
+    embeds = []
+    for text in texts:
+        response = http.post(f"{base_url}/api/embeddings", json={"model": model, "prompt": text})
+        response.raise_for_status()
+        embeds.append(response.json()["embedding"])
+    return embeds
+
+
+def embed_batched(texts, model=OLLAMA_MODEL, base_url=OLLAMA_URL, batch_size=64, session=None, timeout=120):
+    """
+    /api/embed 多輸入版本：一次請求送 batch_size 段文本，並沿用同一個 keep-alive session。
+    註：/api/embed 回傳的是 L2 正規化後的向量，以 COSINE 度量檢索時排名與舊版相同。
+    """
+    own_session = session is None
+    http = session or requests.Session()
+    embeds = []
+    try:
+        for i in range(0, len(texts), batch_size):
+            batch = texts[i:i + batch_size]
+            response = http.post(f"{base_url}/api/embed", json={"model": model, "input": batch}, timeout=timeout)
+            response.raise_for_status()
+            result = response.json()["embeddings"]
+            if len(result) != len(batch):
+                raise ValueError(f"Ollama 回傳 {len(result)} 筆向量，預期 {len(batch)} 筆")
+            embeds.extend(result)
+    finally:
+        if own_session:
+            http.close()
+    return embeds
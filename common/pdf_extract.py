@@ -0,0 +1,248 @@
+"""
+PDF 文字擷取：
+- PageOCRPool：以 process pool 把頁面分散到多個 CPU 核心，每個 worker 各自持有一個 RapidOCR 實例，
+  onnxruntime 執行緒數限制為 cpu_count // workers，避免 N 個 worker 各開滿核心的執行緒互搶。
+  頁面像素直接從 pixmap.samples 轉成 numpy 陣列，不再經過 PNG 編碼/解碼；輸出維持原本的頁序。
+- extract_pdf_hybrid：依文字字數、文字覆蓋率與圖片面積逐頁判斷要用內建文字層還是 OCR，
+  原生 PDF 的頁面完全不走 OCR；已被文字層覆蓋的圖片 (例如已 OCR 過的掃描檔) 也不再重複 OCR。
+"""
+import os
+import time
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz  # PyMuPDF
+import numpy as np
+
+# --- worker 端狀態 (每個子程序各一份) ---
+_worker_ocr = None
+_worker_docs = {}
+
+
+def make_ocr(threads=None):
+    """threads 指定時限制 onnxruntime 的執行緒數 (None 為預設：使用所有核心)"""
+    from rapidocr_onnxruntime import RapidOCR
+
+    if threads:
+        return RapidOCR(intra_op_num_threads=threads, inter_op_num_threads=1)
+    return RapidOCR()
+
+
+def _init_worker(threads):
+    global _worker_ocr
+    _worker_ocr = make_ocr(threads)
+
+
+def _wait_ready(barrier):
+    """預熱用：initializer 已載入模型，等所有 worker 都到齊才返回"""
+    barrier.wait()
+    return os.getpid()
+
+
+def pixmap_to_array(pix):
+    """pixmap 像素直接轉 (H, W, C) uint8 陣列；有 alpha 通道時去掉"""
+    arr = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+    return arr[..., :3] if pix.alpha else arr
+
+
+def ocr_lines(ocr, image):
+    res, _ = ocr(image)
+    return "\n".join([l[1] for l in res]) if res else ""
+
+
+def render_page(page, zoom=1.0, clip=None):
+    matrix = fitz.Matrix(zoom, zoom)
+    return pixmap_to_array(page.get_pixmap(matrix=matrix, clip=clip, alpha=False))
+
+
+def _ocr_region_task(args):
+    """OCR 整頁或頁面中的一塊區域 (clip)，回傳 (文字, 耗時秒數)"""
+    path, page_index, zoom, clip = args
+    start = time.perf_counter()
+    doc = _worker_docs.get(path)
+    if doc is None:
+        doc = _worker_docs[path] = fitz.open(path)
+    text = ocr_lines(_worker_ocr, render_page(doc[page_index], zoom, fitz.Rect(clip) if clip else None))
+    return text, time.perf_counter() - start
+
+
+class PageOCRPool:
+    """
+    可重複使用的頁面 OCR process pool：
+
+        with PageOCRPool() as pool:
+            page_texts = pool.ocr_pdf("scan.pdf")
+    """
+
+    def __init__(self, workers=None, zoom=1.0):
+        self.workers = workers or os.cpu_count() or 1
+        self.zoom = zoom
+        self.threads_per_worker = max(1, (os.cpu_count() or 1) // self.workers)
+        self._pool = None
+        self._local_ocr = None
+
+    def _executor(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                             initargs=(self.threads_per_worker,))
+        return self._pool
+
+    def warm_up(self):
+        """
+        啟動所有 worker 並載入模型 (計時前呼叫)。每個任務都卡在同一個 barrier，
+        workers 個任務必然分散在 workers 個不同的程序上，不會被同一個 worker 連續處理掉。
+        """
+        if self.workers <= 1:
+            self._ocr_local_engine()
+            return
+        with multiprocessing.Manager() as manager:
+            barrier = manager.Barrier(self.workers)
+            list(self._executor().map(_wait_ready, [barrier] * self.workers))
+
+    def _ocr_local_engine(self):
+        if self._local_ocr is None:
+            self._local_ocr = make_ocr()
+        return self._local_ocr
+
+    def _ocr_local(self, path, regions):
+        """區域很少或只有 1 個 worker 時直接在本程序處理，省去啟動子程序的成本"""
+        ocr = self._ocr_local_engine()
+        results = []
+        with fitz.open(path) as doc:
+            for page_index, clip in regions:
+                start = time.perf_counter()
+                image = render_page(doc[page_index], self.zoom, fitz.Rect(clip) if clip else None)
+                results.append((ocr_lines(ocr, image), time.perf_counter() - start))
+        return results
+
+    def ocr_regions(self, path, regions):
+        """
+        regions: [(頁碼, clip)]，clip 為 (x0, y0, x1, y1) 或 None (整頁)。
+        回傳與 regions 順序一致的 [(文字, 耗時秒數)]
+        """
+        regions = list(regions)
+        if self.workers <= 1 or len(regions) <= 1:
+            return self._ocr_local(path, regions)
+        tasks = [(os.path.abspath(path), i, self.zoom, clip) for i, clip in regions]
+        return list(self._executor().map(_ocr_region_task, tasks, chunksize=1))
+
+    def ocr_pages(self, path, page_indexes):
+        """回傳與 page_indexes 順序一致的每頁文字"""
+        return [text for text, _ in self.ocr_regions(path, [(i, None) for i in page_indexes])]
+
+    def ocr_pdf(self, path):
+        with fitz.open(path) as doc:
+            page_count = doc.page_count
+        return self.ocr_pages(path, range(page_count))
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# --- 混合擷取：有文字層的頁面直接讀取，掃描頁才 OCR ---
+
+MIN_TEXT_CHARS = 50        # 文字層少於此字數視為掃描頁，整頁 OCR
+MIN_IMAGE_RATIO = 0.05     # 面積佔頁面此比例以上的圖片才額外 OCR
+# 圖片蓋滿整頁而文字層只佔一點 (頁首、頁碼、浮水印) 時，視為掃描頁，整頁 OCR
+SCAN_IMAGE_RATIO = 0.9
+SCAN_TEXT_RATIO = 0.02
+COVERED_IMAGE_RATIO = 0.3  # 圖片面積有此比例以上與文字區塊重疊，視為已有文字層 (OCR 過的掃描檔)，不再 OCR
+
+# mode: native (文字層) / ocr (整頁 OCR) / mixed (文字層 + 圖片區域 OCR)
+PageResult = namedtuple("PageResult", ["page", "mode", "text", "text_chars", "text_ratio", "image_ratio", "seconds"])
+
+
+def analyse_page(page):
+    """
+    回傳 (文字區塊, 需要 OCR 的圖片區域, 文字字數, 文字覆蓋率, 圖片覆蓋率)。
+    大圖片若已有足夠的文字區塊疊在上面 (文字層已涵蓋其內容)，不列入需要 OCR 的區域
+    """
+    page_area = abs(page.rect) or 1.0
+    blocks = [b for b in page.get_text("blocks", sort=True) if b[6] == 0 and b[4].strip()]
+    text_blocks = [(b[1], b[0], b[4]) for b in blocks]
+    text_rects = [fitz.Rect(b[:4]) for b in blocks]
+    text_chars = sum(len(b[4].strip()) for b in blocks)
+    text_area = sum(abs(r) for r in text_rects)
+
+    regions, image_area = [], 0.0
+    for info in page.get_image_info():
+        rect = fitz.Rect(info["bbox"]) & page.rect
+        area = abs(rect)
+        image_area += area
+        if area / page_area < MIN_IMAGE_RATIO:
+            continue
+        covered = sum(abs(rect & r) for r in text_rects) / area
+        if covered < COVERED_IMAGE_RATIO:
+            regions.append(tuple(rect))
+    return text_blocks, regions, text_chars, min(text_area / page_area, 1.0), min(image_area / page_area, 1.0)
+
+
+def choose_mode(text_chars, text_ratio, image_ratio, regions):
+    """native (文字層) / ocr (整頁 OCR) / mixed (文字層 + 未被文字覆蓋的圖片區域 OCR)"""
+    if text_chars < MIN_TEXT_CHARS:
+        return "ocr"
+    if image_ratio >= SCAN_IMAGE_RATIO and text_ratio < SCAN_TEXT_RATIO:
+        return "ocr"
+    return "mixed" if regions else "native"
+
+
+def extract_pdf_hybrid(path, ocr_pool, verbose=True):
+    """
+    逐頁判斷擷取方式並合併結果 (依閱讀順序：由上而下、由左而右)。
+    回傳 (全文, [PageResult])；需要 OCR 的頁面/區域一次交給 ocr_pool 平行處理。
+    """
+    plans = []
+    with fitz.open(path) as doc:
+        for page in doc:
+            start = time.perf_counter()
+            text_blocks, regions, text_chars, text_ratio, image_ratio = analyse_page(page)
+            mode = choose_mode(text_chars, text_ratio, image_ratio, regions)
+            if mode == "ocr":
+                text_blocks, regions = [], [None]
+            plans.append({
+                "page": page.number, "mode": mode, "blocks": text_blocks, "regions": regions,
+                "text_chars": text_chars, "text_ratio": text_ratio, "image_ratio": image_ratio,
+                "seconds": time.perf_counter() - start,
+            })
+
+    ocr_tasks = [(plan["page"], clip) for plan in plans for clip in plan["regions"]]
+    ocr_results = iter(ocr_pool.ocr_regions(path, ocr_tasks) if ocr_tasks else [])
+
+    results = []
+    for plan in plans:
+        items = list(plan["blocks"])
+        seconds = plan["seconds"]
+        for clip in plan["regions"]:
+            text, ocr_sec = next(ocr_results)
+            seconds += ocr_sec
+            if text:
+                y0, x0 = (clip[1], clip[0]) if clip else (0.0, 0.0)
+                items.append((y0, x0, text))
+        items.sort(key=lambda item: (round(item[0], 1), item[1]))
+        page_text = "\n".join(t.strip() for _, _, t in items)
+        results.append(PageResult(plan["page"] + 1, plan["mode"], page_text, plan["text_chars"],
+                                  plan["text_ratio"], plan["image_ratio"], seconds))
+
+    if verbose:
+        print_page_report(os.path.basename(path), results)
+    return "\n".join(r.text for r in results if r.text), results
+
+
+def print_page_report(name, results):
+    print(f"   📑 {name}：逐頁擷取方式")
+    print(f"   {'頁':>4} | {'方式':<6} | {'文字數':>6} | {'文字覆蓋':>8} | {'圖片覆蓋':>8} | {'耗時(ms)':>8}")
+    for r in results:
+        print(f"   {r.page:>4} | {r.mode:<6} | {r.text_chars:>6} | {r.text_ratio:>8.1%} | {r.image_ratio:>8.1%} | "
+              f"{r.seconds * 1000:>8.1f}")
+    skipped = sum(1 for r in results if r.mode == "native")
+    print(f"   ✅ 共 {len(results)} 頁，其中 {skipped} 頁直接使用文字層 (略過 OCR)，"
+          f"總耗時 {sum(r.seconds for r in results):.2f} 秒")
@@ -0,0 +1,94 @@
+"""
+pdfplumber 平行逐頁擷取：把頁碼切成多段交給 process pool，每個 worker 自行開啟 PDF。
+結果依頁序串流寫入 Markdown (先完成的段落暫存在重排緩衝區)，
+同時在途 (執行中 + 等待寫出) 的段落數有上限，記憶體只跟 max_inflight * pages_per_task 頁有關。
+
+    python -m common.pdfplumber_parallel report.pdf -o report.md --workers 8
+"""
+import os
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from common.converters import PdfPlumberConverter
+
+
+def page_count(path):
+    import pdfplumber
+
+    with pdfplumber.open(path) as pdf:
+        return len(pdf.pages)
+
+
+def page_ranges(total, pages_per_task):
+    return [(start, min(start + pages_per_task, total)) for start in range(0, total, pages_per_task)]
+
+
+def _extract_range(path, start, end):
+    """worker：擷取 [start, end) 頁，回傳 [(頁碼, Markdown)]"""
+    import pdfplumber
+
+    results = []
+    with pdfplumber.open(path, pages=list(range(start + 1, end + 1))) as pdf:
+        for offset, page in enumerate(pdf.pages):
+            results.append((start + offset + 1, PdfPlumberConverter._page_markdown(start + offset + 1, page)))
+            page.close()  # 釋放該頁解析出的物件快取
+    return results
+
+
+def iter_page_markdown(path, workers=None, pages_per_task=8, max_inflight=None):
+    """依頁序逐頁 yield (頁碼, Markdown)"""
+    path = os.path.abspath(path)
+    workers = workers or os.cpu_count() or 1
+    max_inflight = max_inflight or workers * 2
+    ranges = page_ranges(page_count(path), pages_per_task)
+
+    if workers == 1 or len(ranges) <= 1:
+        for start, end in ranges:
+            yield from _extract_range(path, start, end)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {}    # future -> 段落序號
+        finished = {}   # 段落序號 -> 結果 (等待前面的段落完成)
+        next_submit = next_yield = 0
+        while next_yield < len(ranges):
+            while next_submit < len(ranges) and len(pending) + len(finished) < max_inflight:
+                future = pool.submit(_extract_range, path, *ranges[next_submit])
+                pending[future] = next_submit
+                next_submit += 1
+            if next_yield not in finished:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    finished[pending.pop(future)] = future.result()
+                continue
+            yield from finished.pop(next_yield)
+            next_yield += 1
+
+
+def extract_to_markdown(path, output, **kwargs):
+    """串流寫出 Markdown，回傳 (總頁數, 有文字的頁數)"""
+    pages = with_text = 0
+    with open(output, "w", encoding="utf-8") as f:
+        for _, markdown in iter_page_markdown(path, **kwargs):
+            pages += 1
+            if markdown:
+                with_text += 1
+                f.write(markdown)
+    return pages, with_text
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="pdfplumber 平行逐頁擷取")
+    parser.add_argument("pdf")
+    parser.add_argument("-o", "--output")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--pages-per-task", type=int, default=8)
+    parser.add_argument("--max-inflight", type=int)
+    args = parser.parse_args()
+
+    output = args.output or os.path.splitext(args.pdf)[0] + "_pdfplumber.md"
+    start = time.perf_counter()
+    pages, with_text = extract_to_markdown(args.pdf, output, workers=args.workers,
+                                           pages_per_task=args.pages_per_task, max_inflight=args.max_inflight)
+    print(f"✅ {pages} 頁 (有文字 {with_text} 頁)，耗時 {time.perf_counter() - start:.2f} 秒，結果已儲存至 {output}")
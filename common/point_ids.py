@@ -0,0 +1,26 @@
+"""
+確定性 (deterministic) 的 point id：同一個 chunk 每次匯入都得到同一個 uuid5，
+upsert 因此是冪等的，重跑匯入不會讓 collection 重複膨脹。
+"""
+import uuid
+import hashlib
+
+# 固定的命名空間，改動會讓所有既有 id 失效
+POINT_NAMESPACE = uuid.UUID("6f1c1f0e-5a0b-4d7e-9a51-2b8f3c0d7e41")
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_point_id(text, strategy="", source=None, offset=None, dedupe=True):
+    """
+    dedupe=True (預設)：id 只由 (策略, 內容雜湊) 決定，不同來源的相同內容會收斂成同一個點。
+    dedupe=False：id 由 (來源, 策略, 位置, 內容雜湊) 決定，每個出現位置各自一點，但仍可冪等重跑。
+    """
+    if dedupe:
+        name = f"{strategy}|{content_hash(text)}"
+    else:
+        name = f"{source}|{strategy}|{offset}|{content_hash(text)}"
+    return str(uuid.uuid5(POINT_NAMESPACE, name))
+
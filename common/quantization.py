@@ -0,0 +1,62 @@
+"""
+Qdrant 向量量化設定 (scalar int8 / binary) 與對應的查詢參數 (oversampling + 原始向量 rescore)。
+量化後的向量常駐記憶體，原始 float32 向量放在磁碟 (on_disk)，只在 rescore 時讀取候選。
+
+    QDRANT_QUANTIZATION=int8 python CW/03.py      # none / int8 / binary
+    QDRANT_OVERSAMPLING=4 QDRANT_QUANTIZATION=binary python HW/day5/day5-hw.py
+
+建立 collection 時的量化設定由 common.schemas / collection_schema.apply() 套用 (可就地切換，不需重建)；
+查詢端帶上對應的 search_params：
+
+    client.query_points(name, query=vec, limit=3, search_params=search_params())
+"""
+import os
+
+from qdrant_client import models
+
+QUANTIZATION_KINDS = ("none", "int8", "binary")
+DEFAULT_KIND = os.environ.get("QDRANT_QUANTIZATION", "none")
+DEFAULT_OVERSAMPLING = {"none": None, "int8": 2.0, "binary": 3.0}
+
+
+def resolve_kind(kind):
+    kind = kind or DEFAULT_KIND
+    if kind not in QUANTIZATION_KINDS:
+        raise ValueError(f"未知的量化方式: {kind} (可用: {', '.join(QUANTIZATION_KINDS)})")
+    return kind
+
+
+def quantization_config(kind=None, always_ram=True, quantile=0.99):
+    kind = resolve_kind(kind)
+    if kind == "int8":
+        return models.ScalarQuantization(scalar=models.ScalarQuantizationConfig(
+            type=models.ScalarType.INT8, quantile=quantile, always_ram=always_ram))
+    if kind == "binary":
+        return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=always_ram))
+    return None
+
+
+def vector_params(size, distance=models.Distance.COSINE, kind=None):
+    """有量化時原始向量放磁碟 (記憶體只留量化後的向量)"""
+    return models.VectorParams(size=size, distance=distance, on_disk=resolve_kind(kind) != "none")
+
+
+def search_params(kind=None, oversampling=None, rescore=True, hnsw_ef=None):
+    """先以量化向量取 limit × oversampling 個候選，再用原始向量重新計分排序"""
+    kind = resolve_kind(kind)
+    if kind == "none":
+        return models.SearchParams(hnsw_ef=hnsw_ef) if hnsw_ef else None
+    oversampling = oversampling or float(os.environ.get("QDRANT_OVERSAMPLING", 0)) or DEFAULT_OVERSAMPLING[kind]
+    return models.SearchParams(hnsw_ef=hnsw_ef, quantization=models.QuantizationSearchParams(
+        ignore=False, rescore=rescore, oversampling=oversampling))
+
+
+def bytes_per_vector(dim, kind=None):
+    """常駐記憶體中每個向量的大小 (不含 HNSW 圖與 payload)"""
+    kind = resolve_kind(kind)
+    if kind == "int8":
+        return dim + 4  # 每維 1 byte，另存一個修正用的 float
+    if kind == "binary":
+        return (dim + 7) // 8
+    return dim * 4
+
@@ -0,0 +1,56 @@
+"""
+各腳本使用的 Qdrant collection 設定 (向量維度由執行時的 embedding 決定，因此以函式產生)。
+要調整 HNSW、on-disk 或 payload 索引，只改這裡；下次執行時 apply() 會就地套用，不必重新匯入。
+量化方式預設依 QDRANT_QUANTIZATION 環境變數。
+"""
+from common.collection_schema import CollectionSchema, HnswSpec, SparseVectorSpec, VectorSpec
+
+DEFAULT_HNSW = HnswSpec(m=16, ef_construct=100)
+
+
+def metric_comparison(name, dim, distance):
+    """CW/01：三種距離度量各一個 collection"""
+    return CollectionSchema(name, vectors={"": VectorSpec(dim, distance)}, hnsw=DEFAULT_HNSW)
+
+
+def day5_grid(name, dim, distance):
+    """day5：(切塊方式 × 距離度量) 的實驗 collection，資料量小，HNSW 建圖參數可以低一些"""
+    return CollectionSchema(name, vectors={"": VectorSpec(dim, distance)}, hnsw=HnswSpec(m=16, ef_construct=64))
+
+
+def gemma_multi_turn_rag(dim):
+    """CW/03：多輪對話 RAG"""
+    return CollectionSchema("gemma_multi_turn_rag", vectors={"": VectorSpec(dim)}, hnsw=DEFAULT_HNSW)
+
+
+def water_qa_hw(dim):
+    """day6：dense + BM25 稀疏向量 (IDF 由伺服器端套用)"""
+    return CollectionSchema(
+        "water_qa_hw",
+        vectors={"dense": VectorSpec(dim)},
+        sparse_vectors={"sparse": SparseVectorSpec(idf=True)},
+        hnsw=DEFAULT_HNSW,
+    )
+
+
+def ultimate_context_rag(dim):
+    """day7：以 chunk 為單位的向量庫"""
+    return CollectionSchema("ultimate_context_rag", vectors={"": VectorSpec(dim)}, hnsw=DEFAULT_HNSW)
+
+
+def test_collection(dim):
+    """ragtest.py：year 以範圍條件過濾，需要 integer 索引"""
+    return CollectionSchema("test_collection", vectors={"": VectorSpec(dim)}, payload_indexes={"year": "integer"},
+                            hnsw=DEFAULT_HNSW)
+
+
+# CLI 用：python -m common.collection_schema plan|apply <名稱> --dim D
+SCHEMAS = {
+    "euclidean_collection": lambda dim: metric_comparison("euclidean_collection", dim, "euclid"),
+    "inner_product_collection": lambda dim: metric_comparison("inner_product_collection", dim, "dot"),
+    "cosine_collection": lambda dim: metric_comparison("cosine_collection", dim, "cosine"),
+    "gemma_multi_turn_rag": gemma_multi_turn_rag,
+    "water_qa_hw": water_qa_hw,
+    "ultimate_context_rag": ultimate_context_rag,
+    "test_collection": test_collection,
+}
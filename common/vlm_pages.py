@@ -0,0 +1,153 @@
+"""
+逐頁 VLM 轉換：把 PDF 每頁渲染成圖片，以有上限的併發數送到 OpenAI 相容的 chat/completions 端點。
+- 每頁各自重試 (5xx / 524 / 429 / 連線錯誤，隨機退避)，單頁失敗不會拖垮整份文件
+- 每完成一頁就寫入 checkpoint 目錄，中斷後重跑會從未完成的頁面繼續
+"""
+import os
+import re
+import json
+import time
+import base64
+import random
+import asyncio
+import hashlib
+
+import httpx
+
+from common.async_embed import RETRY_STATUS
+
+FENCE_RE = re.compile(r"^\s*```(?:markdown|md)?\s*\n(.*?)\n?```\s*$", re.DOTALL)
+
+
+def strip_code_fence(text):
+    """模型常把輸出包在 ```markdown ... ``` 裡，去掉外層圍欄"""
+    match = FENCE_RE.match(text)
+    return match.group(1) if match else text
+
+
+def render_page_png(pdf_path, page_index, scale=1.0):
+    import fitz  # PyMuPDF
+
+    with fitz.open(pdf_path) as doc:
+        return doc[page_index].get_pixmap(matrix=fitz.Matrix(scale, scale)).tobytes("png")
+
+
+def page_count(pdf_path):
+    import fitz
+
+    with fitz.open(pdf_path) as doc:
+        return doc.page_count
+
+
+class PageCheckpoint:
+    """每頁一個 Markdown 檔；meta.json 記錄 PDF 雜湊與選項，不一致時捨棄舊的 checkpoint"""
+
+    def __init__(self, directory, pdf_path, options):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        with open(pdf_path, "rb") as f:
+            pdf_hash = hashlib.sha256(f.read()).hexdigest()
+        meta = {"pdf_sha256": pdf_hash, "options": options}
+        meta_path = os.path.join(directory, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                if json.load(f) != json.loads(json.dumps(meta)):
+                    self.clear()
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+    def _page_path(self, page_no):
+        return os.path.join(self.directory, f"page_{page_no:04d}.md")
+
+    def load(self, page_no):
+        path = self._page_path(page_no)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                return f.read()
+        return None
+
+    def save(self, page_no, markdown):
+        tmp_path = self._page_path(page_no) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(markdown)
+        os.replace(tmp_path, self._page_path(page_no))
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.startswith("page_") and name.endswith(".md"):
+                os.remove(os.path.join(self.directory, name))
+
+
+async def _convert_page(client, sem, url, headers, params, prompt, pdf_path, page_index, scale,
+                        retries, base_delay, max_delay):
+    async with sem:
+        png = await asyncio.to_thread(render_page_png, pdf_path, page_index, scale)
+        image_url = "data:image/png;base64," + base64.b64encode(png).decode("ascii")
+        payload = {
+            **params,
+            "messages": [{
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": prompt},
+                    {"type": "image_url", "image_url": {"url": image_url}},
+                ],
+            }],
+        }
+        last_error = None
+        for attempt in range(retries):
+            try:
+                response = await client.post(url, json=payload, headers=headers)
+                if response.status_code == 200:
+                    return strip_code_fence(response.json()["choices"][0]["message"]["content"])
+                last_error = f"HTTP {response.status_code}"
+                if response.status_code not in RETRY_STATUS:
+                    break
+            except (httpx.HTTPError, ValueError, KeyError) as e:
+                last_error = str(e) or e.__class__.__name__
+            print(f"⚠️ 第 {page_index + 1} 頁第 {attempt + 1} 次失敗 ({last_error})")
+            if attempt + 1 < retries:
+                await asyncio.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** attempt)))
+        raise RuntimeError(f"第 {page_index + 1} 頁轉換失敗：{last_error}")
+
+
+async def convert_pages_async(pdf_path, url, params, prompt, checkpoint_dir, concurrency=4, scale=1.0,
+                              retries=5, timeout=300, api_key=None, base_delay=2.0, max_delay=30.0):
+    """
+    回傳依頁序排列的每頁 Markdown；有頁面最終失敗時，已完成的頁面仍保留在 checkpoint，
+    並拋出 RuntimeError 列出失敗頁碼 (重跑即可續傳)。
+    """
+    options = {"url": url, "params": params, "prompt": prompt, "scale": scale}
+    checkpoint = PageCheckpoint(checkpoint_dir, pdf_path, options)
+    total = page_count(pdf_path)
+    pages = {p: checkpoint.load(p) for p in range(1, total + 1)}
+    todo = [p for p, md in pages.items() if md is None]
+    print(f"📄 共 {total} 頁：checkpoint 已有 {total - len(todo)} 頁，待轉換 {len(todo)} 頁 (併發 {concurrency})")
+
+    headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+    sem = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    failures = {}
+    start = time.perf_counter()
+
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+        async def run(page_no):
+            try:
+                markdown = await _convert_page(client, sem, url, headers, params, prompt, pdf_path, page_no - 1,
+                                               scale, retries, base_delay, max_delay)
+            except Exception as e:
+                failures[page_no] = str(e)
+                return
+            checkpoint.save(page_no, markdown)
+            pages[page_no] = markdown
+            print(f"✅ 第 {page_no} 頁完成 ({time.perf_counter() - start:.1f}s)")
+
+        await asyncio.gather(*[run(p) for p in todo])
+
+    if failures:
+        raise RuntimeError(f"{len(failures)} 頁轉換失敗 (頁碼 {sorted(failures)})，已完成的頁面保留在 {checkpoint_dir}")
+    return [pages[p] for p in range(1, total + 1)]
+
+
+def convert_pages(pdf_path, url, params, prompt, checkpoint_dir, **kwargs):
+    """同步腳本用的入口"""
+    return asyncio.run(convert_pages_async(str(pdf_path), url, params, prompt, str(checkpoint_dir), **kwargs))
@@ -1,7 +1,10 @@
+import sys
 import numpy as np
 from qdrant_client import QdrantClient
 from qdrant_client.http.models import Distance, VectorParams, PointStruct
 
+from common.numpy_index import NumpyIndex
+
 # --- 1. 初始化 Qdrant 客戶端 ---
 client = QdrantClient(":memory:")
 
@@ -66,7 +69,33 @@ def verify_and_search():
     print("="*50)
     print("🚀 所有驗證已完成，三個庫運作正常。")
 
+# --- 5. 本地模式：同一份矩陣直接比較三種度量，不需要建立三個庫 ---
+LOCAL_METRICS = {
+    "euclidean_collection": "euclid",
+    "inner_product_collection": "dot",
+    "cosine_collection": "cosine",
+}
+
+def run_local():
+    index = NumpyIndex(DIMENSION, capacity=NUM_ENTITIES)
+    vectors = np.random.random((NUM_ENTITIES, DIMENSION))
+    index.add(vectors, payloads=[{"original_idx": i} for i in range(NUM_ENTITIES)])
+    print(f"✅ 已將 {NUM_ENTITIES} 筆資料放入本地索引 (單一矩陣)")
+
+    query_vector = np.random.random(DIMENSION)
+    print("\n" + "="*50)
+    print(f"{'度量':<25} | {'首位 ID':<8} | {'得分 (Score)':<10}")
+    print("-"*50)
+    hits_by_metric = index.search_batch_metrics([query_vector], list(LOCAL_METRICS.values()), limit=1)
+    for name, metric in LOCAL_METRICS.items():
+        hit = hits_by_metric[metric][0][0]
+        print(f"{name:<25} | {hit.id:<8} | {hit.score:.4f}")
+    print("="*50)
+
 if __name__ == "__main__":
-    create_collections()
-    insert_data()
-    verify_and_search()
\ No newline at end of file
+    if "--local" in sys.argv:
+        run_local()
+    else:
+        create_collections()
+        insert_data()
+        verify_and_search()
\ No newline at end of file
@@ -1,32 +1,26 @@
+import os
 import requests
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct, Filter, FieldCondition, Range
+from qdrant_client.models import PointStruct, Filter, FieldCondition, Range
+from common.ollama_embed import embed_batched, embed_one_by_one
+from common.collection_schema import apply as apply_schema
+from common.schemas import test_collection
 
 # 1. 建立 Qdrant 連接
 client = QdrantClient(url="http://localhost:6333")
 
+# 批次設定：EMBED_BATCH_SIZE=0 代表改回舊版逐筆呼叫 /api/embeddings
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", 64))
+UPSERT_BATCH_SIZE = int(os.environ.get("UPSERT_BATCH_SIZE", 256))
+session = requests.Session()  # 共用 keep-alive 連線
+
 # 定義 Embedding API 函式 (對應作業要求 3)
 def get_embedding(texts):
-    embeds = []
-    for text in texts:
-        response = requests.post(
-            "http://localhost:11434/api/embeddings",
-            json={"model": "llama3", "prompt": text}
-        )
-        embeds.append(response.json()['embedding'])
-    return embeds
-
-# 2. 建立 Collection (對應作業要求 1)
-collection_name = "test_collection"
-if client.collection_exists(collection_name):
-    client.delete_collection(collection_name)
-
-client.create_collection(
-    collection_name=collection_name,
-    vectors_config=VectorParams(size=4096, distance=Distance.COSINE),
-)
+    if EMBED_BATCH_SIZE <= 0:
+        return embed_one_by_one(texts, model="llama3", session=session)
+    return embed_batched(texts, model="llama3", batch_size=EMBED_BATCH_SIZE, session=session)
 
-# 3. 建立五個 Point 並嵌入 VDB (對應作業要求 2 & 4)
+# 2. 建立五個 Point (對應作業要求 2 & 4)
 data_list = [
     {"id": 1, "text": "人工智能很有趣", "year": 5},
     {"id": 2, "text": "機器學習是未來", "year": 2},
@@ -35,19 +29,25 @@ data_list = [
     {"id": 5, "text": "Python 是 AI 的首選", "year": 4}
 ]
 
-# 取得向量並上傳
-for item in data_list:
-    vector = get_embedding([item["text"]])[0]
-    client.upsert(
-        collection_name=collection_name,
-        points=[
-            PointStruct(
-                id=item["id"],
-                vector=vector,
-                payload={"text": item["text"], "year": item["year"]}
-            )
-        ]
+# 取得向量 (一次批次向量化)
+vectors = get_embedding([item["text"] for item in data_list])
+points = [
+    PointStruct(
+        id=item["id"],
+        vector=vector,
+        payload={"text": item["text"], "year": item["year"]}
     )
+    for item, vector in zip(data_list, vectors)
+]
+
+# 3. 建立 Collection 並嵌入 VDB (對應作業要求 1)
+# 維度取自實際的向量；schema 含 year 的 integer 索引，下面的範圍過濾會走索引
+# 設定未變動時沿用既有的 collection，固定 id 的 upsert 直接覆蓋
+collection_name = "test_collection"
+apply_schema(client, test_collection(len(vectors[0])))
+
+for i in range(0, len(points), UPSERT_BATCH_SIZE):
+    client.upsert(collection_name=collection_name, points=points[i:i + UPSERT_BATCH_SIZE])
 
 # 4. 召回內容 - 相似度搜尋 (對應作業要求 5 & 圖片 772078)
 print("--- 執行相似度搜尋 ---")